@@ -0,0 +1,190 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import tempfile
+import time
+
+# Search engines to compare, and whether each needs the compact graph
+ENGINES = {
+    "bfs": False,
+    "bidirectional": False,
+    "bipartite": False,
+    "compact": True
+}
+
+
+def generate(directory, num_people, num_movies, cast_mean=8.0,
+             skew=1.0, seed=0):
+    """
+    Writes a synthetic people.csv, movies.csv and stars.csv to
+    `directory`.
+
+    Cast sizes are geometric with mean `cast_mean`. Each star is drawn
+    with probability proportional to 1 / rank ** `skew`, so a larger
+    skew gives fewer, busier hub actors; 0 draws everyone uniformly.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    weights = [1 / (rank + 1) ** skew for rank in range(num_people)]
+    cumulative = []
+    total = 0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+
+    with open(os.path.join(directory, "people.csv"), "w",
+              encoding="utf-8") as f:
+        f.write("id,name,birth\n")
+        for i in range(num_people):
+            f.write(f'{i},"Person {i}",{rng.randint(1900, 2010)}\n')
+
+    with open(os.path.join(directory, "movies.csv"), "w",
+              encoding="utf-8") as f:
+        f.write("id,title,year\n")
+        for i in range(num_movies):
+            f.write(f'{i},"Movie {i}",{rng.randint(1920, 2020)}\n')
+
+    with open(os.path.join(directory, "stars.csv"), "w",
+              encoding="utf-8") as f:
+        f.write("person_id,movie_id\n")
+        for movie in range(num_movies):
+            size = 1
+            while rng.random() > 1 / cast_mean:
+                size += 1
+            cast = set(rng.choices(range(num_people), cum_weights=cumulative,
+                                   k=min(size, num_people)))
+            for person in cast:
+                f.write(f"{person},{movie}\n")
+
+
+def run_engine(directory, engine, pairs, neighbor_samples):
+    """
+    Loads `directory` and times `engine` over every (source, target)
+    pair, returning the measurements as a dictionary.
+    Meant to run in a fresh process so peak RSS belongs to one engine.
+    """
+    import degrees
+
+    start = time.perf_counter()
+    degrees.load_data(directory, compact=ENGINES[engine])
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for person_id in neighbor_samples:
+        if ENGINES[engine]:
+            degrees.graph.neighbors(degrees.graph.person_index[person_id])
+        else:
+            degrees.neighbors_for_person(person_id)
+    neighbor_seconds = ((time.perf_counter() - start)
+                        / max(len(neighbor_samples), 1))
+
+    latencies = []
+    explored = []
+    peak_frontier = 0
+    lengths = []
+    for source, target in pairs:
+        stats = {}
+        start = time.perf_counter()
+        path = degrees.shortest_path(source, target, mode=engine,
+                                     stats=stats)
+        latencies.append(time.perf_counter() - start)
+        explored.append(stats["explored"])
+        peak_frontier = max(peak_frontier, stats["peak_frontier"])
+        lengths.append(None if path is None else len(path))
+
+    return {
+        "engine": engine,
+        "load_seconds": load_seconds,
+        "neighbors_for_person_seconds": neighbor_seconds,
+        "queries": len(pairs),
+        "latency_seconds": percentiles(latencies),
+        "explored_mean": statistics.fmean(explored) if explored else 0,
+        "peak_frontier": peak_frontier,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "lengths": lengths
+    }
+
+
+def percentiles(values):
+    """
+    Returns the p50, p90, p99 and max of `values`.
+    """
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def at(fraction):
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+    return {"p50": at(0.5), "p90": at(0.9), "p99": at(0.99),
+            "max": ordered[-1]}
+
+
+def benchmark(directory, engines, num_queries, seed=0):
+    """
+    Runs every engine in its own process over the same random pairs of
+    people and returns their results, checking that all engines agree
+    on every path length.
+    """
+    with open(os.path.join(directory, "people.csv"), encoding="utf-8") as f:
+        person_ids = [line.split(",", 1)[0] for line in list(f)[1:]]
+    rng = random.Random(seed)
+    pairs = [(rng.choice(person_ids), rng.choice(person_ids))
+             for _ in range(num_queries)]
+    neighbor_samples = rng.sample(person_ids, min(1000, len(person_ids)))
+
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for engine in engines:
+        with context.Pool(1) as pool:
+            results.append(pool.apply(
+                run_engine, (directory, engine, pairs, neighbor_samples)
+            ))
+
+    reference = results[0]["lengths"]
+    for result in results:
+        result["agrees"] = result.pop("lengths") == reference
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the degrees search engines on a synthetic "
+                    "co-star graph and print the results as JSON."
+    )
+    parser.add_argument("--people", type=int, default=20000)
+    parser.add_argument("--movies", type=int, default=10000)
+    parser.add_argument("--cast", type=float, default=8.0,
+                        help="mean cast size")
+    parser.add_argument("--skew", type=float, default=1.0,
+                        help="power-law exponent of actor popularity")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES),
+                        default=list(ENGINES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--directory",
+                        help="keep the generated CSV files here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        directory = args.directory or scratch
+        generate(directory, args.people, args.movies, cast_mean=args.cast,
+                 skew=args.skew, seed=args.seed)
+        results = benchmark(directory, args.engines, args.queries,
+                            seed=args.seed)
+
+    print(json.dumps({
+        "people": args.people,
+        "movies": args.movies,
+        "cast": args.cast,
+        "skew": args.skew,
+        "results": results
+    }, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,488 @@
+import csv
+import json
+import os
+import shutil
+from array import array
+from functools import cached_property
+
+import numpy as np
+
+
+class CompactGraph():
+    """
+    Co-star graph with people and movies interned to dense integers.
+
+    Each person's movies and each movie's stars are stored as CSR
+    adjacency: `person_offsets[i]:person_offsets[i + 1]` slices
+    `person_movies` for person i, and likewise for movie stars.
+    IMDb ids, names and titles are only used to translate queries
+    and results.
+
+    The arrays, string tables and lookup indexes can be saved to a
+    snapshot directory and memory-mapped back with `load`.
+    """
+
+    # Files making up a snapshot, besides the string tables
+    ARRAYS = ["person_offsets", "person_movies",
+              "movie_offsets", "movie_stars", "components"]
+    STRINGS = ["person_ids", "person_names", "person_births",
+               "movie_ids", "movie_titles", "movie_years"]
+    INDEXES = ["person_index", "movie_index", "name_index"]
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies, movie_offsets, movie_stars,
+                 components=None, person_index=None, movie_index=None,
+                 name_index=None):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+        if components is None:
+            components = _components(movie_offsets, movie_stars,
+                                     len(person_ids))
+        # Label of each person's connected component in the co-star graph
+        self.components = components
+        # Indexes loaded from a snapshot replace the cached properties
+        if person_index is not None:
+            self.person_index = person_index
+        if movie_index is not None:
+            self.movie_index = movie_index
+        if name_index is not None:
+            self.name_index = name_index
+
+    @cached_property
+    def person_index(self):
+        """Maps IMDb person ids to person indices."""
+        return SortedIndex.build(self.person_ids)
+
+    @cached_property
+    def movie_index(self):
+        """Maps IMDb movie ids to movie indices."""
+        return SortedIndex.build(self.movie_ids)
+
+    @cached_property
+    def name_index(self):
+        """Maps lowercase names to the person indices sharing them."""
+        return SortedIndex.build(name.lower() for name in self.person_names)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a CompactGraph saved with `save`, memory-mapping its arrays.
+        """
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+            for name in cls.ARRAYS
+        }
+        strings = {
+            name: StringTable.load(path, name) for name in cls.STRINGS
+        }
+        indexes = {
+            name: SortedIndex.load(path, name) for name in cls.INDEXES
+        }
+        return cls(**strings, **arrays, **indexes)
+
+    def save(self, path):
+        """
+        Save the graph as .npy arrays in directory `path`.
+        """
+        os.makedirs(path, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, f"{name}.npy"), getattr(self, name))
+        for name in self.STRINGS:
+            StringTable.save(path, name, getattr(self, name))
+        for name in self.INDEXES:
+            getattr(self, name).save(path, name)
+
+    @classmethod
+    def from_csv(cls, directory):
+        """
+        Load a CompactGraph from the people, movies and stars CSV files
+        in `directory`.
+        """
+        person_ids, person_names, person_births = [], [], []
+        with open(f"{directory}/people.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                person_ids.append(row["id"])
+                person_names.append(row["name"])
+                person_births.append(row["birth"])
+
+        movie_ids, movie_titles, movie_years = [], [], []
+        with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                movie_ids.append(row["id"])
+                movie_titles.append(row["title"])
+                movie_years.append(row["year"])
+
+        person_index = {
+            person_id: i for i, person_id in enumerate(person_ids)
+        }
+        movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+
+        # Collect (person, movie) pairs, skipping unknown ids
+        star_people = array("i")
+        star_movies = array("i")
+        with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                person = person_index.get(row["person_id"])
+                movie = movie_index.get(row["movie_id"])
+                if person is None or movie is None:
+                    continue
+                star_people.append(person)
+                star_movies.append(movie)
+
+        pairs_people = np.frombuffer(star_people, dtype=np.int32)
+        pairs_movies = np.frombuffer(star_movies, dtype=np.int32)
+
+        # Drop duplicate rows, as the dict loader does with sets
+        keys = np.unique(
+            pairs_people.astype(np.int64) * len(movie_ids) + pairs_movies
+        )
+        pairs_people = (keys // max(len(movie_ids), 1)).astype(np.int32)
+        pairs_movies = (keys % max(len(movie_ids), 1)).astype(np.int32)
+
+        person_offsets, person_movies = _csr(
+            pairs_people, pairs_movies, len(person_ids)
+        )
+        movie_offsets, movie_stars = _csr(
+            pairs_movies, pairs_people, len(movie_ids)
+        )
+        return cls(person_ids, person_names, person_births,
+                   movie_ids, movie_titles, movie_years,
+                   person_offsets, person_movies, movie_offsets, movie_stars)
+
+    def person(self, person_id):
+        """Returns the name and birth of a person, like `people` entries."""
+        i = self.person_index[person_id]
+        return {"name": self.person_names[i], "birth": self.person_births[i]}
+
+    def movie(self, movie_id):
+        """Returns the title and year of a movie, like `movies` entries."""
+        i = self.movie_index[movie_id]
+        return {"title": self.movie_titles[i], "year": self.movie_years[i]}
+
+    def person_ids_for_name(self, name):
+        """Returns the IMDb ids of everyone called `name`."""
+        return [self.person_ids[i]
+                for i in self.name_index.all(name.lower())]
+
+    def neighbors(self, person):
+        """
+        Returns (movie, person) index arrays for everyone who starred
+        with person index `person`.
+        """
+        movies = self.person_movies[
+            self.person_offsets[person]:self.person_offsets[person + 1]
+        ]
+        owners, stars = _expand(self.movie_offsets, self.movie_stars, movies)
+        return movies[owners], stars
+
+    def connected(self, source_id, target_id):
+        """Returns whether any path connects two people."""
+        return (self.components[self.person_index[source_id]]
+                == self.components[self.person_index[target_id]])
+
+    def shortest_path(self, source_id, target_id, max_degrees=None,
+                      stats=None):
+        """
+        Returns the shortest list of (movie_id, person_id) pairs that
+        connect the source to the target, or None if there is none
+        (of at most `max_degrees`). Search counters are recorded in
+        `stats` if given, as for `bfs`.
+        """
+        if not self.connected(source_id, target_id):
+            return None
+        source = self.person_index[source_id]
+        target = self.person_index[target_id]
+        _, parent_person, parent_movie = self.bfs(
+            source, target=target, max_depth=max_degrees, stats=stats
+        )
+        if parent_person[target] == -1:
+            return None
+        return self._path(parent_person, parent_movie, target)
+
+    def bfs(self, source, target=None, max_depth=None, stats=None):
+        """
+        Runs a breadth-first search from person index `source` one whole
+        layer at a time over the CSR arrays, stopping early once
+        `target` has been generated if a target is given, and after
+        `max_depth` layers if that is given.
+
+        Returns (distance, parent_person, parent_movie) arrays indexed
+        by person, holding -1 for people the search did not reach.
+        The source is its own parent.
+
+        If a `stats` dictionary is given, the number of people
+        `explored` and the `peak_frontier` (largest layer) are recorded.
+        """
+        if stats is None:
+            stats = {}
+        stats.update(explored=0, peak_frontier=0)
+        distance = np.full(len(self.person_ids), -1, dtype=np.int32)
+        parent_person = np.full(len(self.person_ids), -1, dtype=np.int32)
+        parent_movie = np.full(len(self.person_ids), -1, dtype=np.int32)
+        # Each movie's cast only needs scanning the first time it is reached
+        movie_seen = np.zeros(len(self.movie_ids), dtype=bool)
+        distance[source] = 0
+        parent_person[source] = source
+        layer = np.array([source], dtype=np.int32)
+        depth = 0
+
+        while len(layer) and (target is None or distance[target] == -1):
+            if max_depth is not None and depth >= max_depth:
+                break
+            depth += 1
+            stats["explored"] += len(layer)
+            stats["peak_frontier"] = max(stats["peak_frontier"], len(layer))
+            people, movies, stars = self._expand_layer(layer, movie_seen)
+
+            # Keep the first discovery of each unvisited person
+            fresh = distance[stars] == -1
+            stars, first = np.unique(stars[fresh], return_index=True)
+            distance[stars] = depth
+            parent_person[stars] = people[fresh][first]
+            parent_movie[stars] = movies[fresh][first]
+            layer = stars
+
+        return distance, parent_person, parent_movie
+
+    def _expand_layer(self, layer, movie_seen):
+        """
+        Returns (person, movie, star) index arrays for every co-star
+        reachable in one step from the people in `layer` through movies
+        not yet marked in `movie_seen`, then marks those movies.
+        """
+        owners, movies = _expand(
+            self.person_offsets, self.person_movies, layer
+        )
+        movies, first = np.unique(movies, return_index=True)
+        fresh = ~movie_seen[movies]
+        movies = movies[fresh]
+        people = layer[owners[first[fresh]]]
+        movie_seen[movies] = True
+        owners, stars = _expand(self.movie_offsets, self.movie_stars, movies)
+        return people[owners], movies[owners], stars
+
+    def _path(self, parent_person, parent_movie, target):
+        """
+        Follows parent pointers back from `target` and returns the
+        (movie_id, person_id) pairs leading to it.
+        """
+        path = []
+        person = target
+        while parent_person[person] != person:
+            path.append([self.movie_ids[parent_movie[person]],
+                         self.person_ids[person]])
+            person = parent_person[person]
+        path.reverse()
+        return path
+
+
+class StringTable():
+    """
+    Read-only sequence of strings stored as one UTF-8 blob plus an
+    offsets array, both memory-mapped from a snapshot directory.
+    """
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode()
+
+    def __iter__(self):
+        # Copy the blob out once rather than slicing the memory map per item
+        data = self.blob.tobytes()
+        offsets = self.offsets.tolist()
+        for start, end in zip(offsets, offsets[1:]):
+            yield data[start:end].decode()
+
+    @classmethod
+    def load(cls, path, name):
+        return cls(
+            np.load(os.path.join(path, f"{name}.blob.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, f"{name}.offsets.npy"), mmap_mode="r")
+        )
+
+    @classmethod
+    def save(cls, path, name, strings):
+        encoded = [string.encode() for string in strings]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(string) for string in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        np.save(os.path.join(path, f"{name}.blob.npy"), blob)
+        np.save(os.path.join(path, f"{name}.offsets.npy"), offsets)
+
+
+class SortedIndex():
+    """
+    Read-only mapping from strings to the positions holding them in a
+    sequence, searched with `np.searchsorted` so that it can be
+    memory-mapped from a snapshot instead of rebuilt as a dictionary.
+
+    `keys` holds the UTF-8 encoded strings in sorted order as a
+    fixed-width bytes array, and `order` the position of each.
+    """
+
+    def __init__(self, keys, order):
+        self.keys = keys
+        self.order = order
+
+    @classmethod
+    def build(cls, strings):
+        encoded = np.array([string.encode() for string in strings],
+                           dtype=bytes)
+        if not len(encoded):
+            encoded = np.array([], dtype="S1")
+        order = np.argsort(encoded, kind="stable").astype(np.int32)
+        return cls(encoded[order], order)
+
+    @classmethod
+    def load(cls, path, name):
+        return cls(
+            np.load(os.path.join(path, f"{name}.keys.npy"), mmap_mode="r"),
+            np.load(os.path.join(path, f"{name}.order.npy"), mmap_mode="r")
+        )
+
+    def save(self, path, name):
+        np.save(os.path.join(path, f"{name}.keys.npy"), self.keys)
+        np.save(os.path.join(path, f"{name}.order.npy"), self.order)
+
+    def _range(self, key):
+        key = key.encode()
+        if len(key) > self.keys.dtype.itemsize or key.endswith(b"\0"):
+            # Longer than any key, or lost when stored as fixed width
+            return 0, 0
+        start = np.searchsorted(self.keys, key, side="left")
+        end = np.searchsorted(self.keys, key, side="right")
+        return int(start), int(end)
+
+    def all(self, key):
+        """Returns every position holding `key`, in order."""
+        start, end = self._range(key)
+        return self.order[start:end].tolist()
+
+    def get(self, key, default=None):
+        """Returns the first position holding `key`, or `default`."""
+        start, end = self._range(key)
+        return int(self.order[start]) if start < end else default
+
+    def __getitem__(self, key):
+        i = self.get(key)
+        if i is None:
+            raise KeyError(key)
+        return i
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+
+def load_cached(directory, cache=None):
+    """
+    Returns the CompactGraph for the CSV files in `directory`, loading
+    it from the snapshot in `cache` (by default a `.degrees_cache`
+    directory next to the CSVs) when that snapshot is still current.
+
+    The snapshot records the size and mtime of each CSV file; if any
+    has changed, the CSVs are parsed again and the snapshot rewritten.
+    """
+    if cache is None:
+        cache = os.path.join(directory, ".degrees_cache")
+    stamp = csv_stamp(directory)
+
+    try:
+        with open(os.path.join(cache, "stamp.json")) as f:
+            if json.load(f) == stamp:
+                return CompactGraph.load(cache)
+    except (OSError, ValueError):
+        pass
+
+    graph = CompactGraph.from_csv(directory)
+
+    # Write to a scratch directory first so readers never see half a snapshot
+    scratch = f"{cache}.tmp{os.getpid()}"
+    shutil.rmtree(scratch, ignore_errors=True)
+    graph.save(scratch)
+    with open(os.path.join(scratch, "stamp.json"), "w") as f:
+        json.dump(stamp, f)
+    shutil.rmtree(cache, ignore_errors=True)
+    os.replace(scratch, cache)
+    return graph
+
+
+def csv_stamp(directory):
+    """
+    Returns the size and mtime of each CSV file the graph is built from.
+    """
+    stamp = {}
+    for filename in ["people.csv", "movies.csv", "stars.csv"]:
+        info = os.stat(os.path.join(directory, filename))
+        stamp[filename] = [info.st_size, info.st_mtime_ns]
+    return stamp
+
+
+def _components(movie_offsets, movie_stars, size):
+    """
+    Returns the connected component label of each of `size` people,
+    found with union-find over every movie's stars. Each label is the
+    index of one member of the component.
+    """
+    parent = list(range(size))
+
+    def find(person):
+        while parent[person] != person:
+            parent[person] = parent[parent[person]]
+            person = parent[person]
+        return person
+
+    offsets = movie_offsets.tolist()
+    stars = movie_stars.tolist()
+    for movie in range(len(offsets) - 1):
+        cast = stars[offsets[movie]:offsets[movie + 1]]
+        if not cast:
+            continue
+        root = find(cast[0])
+        for star in cast[1:]:
+            other = find(star)
+            if other != root:
+                parent[other] = root
+
+    return np.array([find(person) for person in range(size)], dtype=np.int32)
+
+
+def _csr(rows, columns, size):
+    """
+    Builds CSR (offsets, indices) arrays for the edges rows -> columns
+    over `size` rows.
+    """
+    order = np.argsort(rows, kind="stable")
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=size), out=offsets[1:])
+    return offsets, columns[order].astype(np.int32)
+
+
+def _expand(offsets, indices, nodes):
+    """
+    Returns (owner, neighbor) arrays listing every CSR neighbor of
+    `nodes`, where owner is the position in `nodes` it came from.
+    """
+    starts = offsets[nodes]
+    counts = offsets[nodes + 1] - starts
+    owners = np.repeat(np.arange(len(nodes)), counts)
+    positions = np.arange(counts.sum()) + np.repeat(
+        starts - (np.cumsum(counts) - counts), counts
+    )
+    return owners, indices[positions]
@@ -1,9 +1,15 @@
+import argparse
 import csv
+import json
+import os
+import re
 import sys
 import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
 
 
-from util import Node, StackFrontier, QueueFrontier
+from util import Node, DequeQueueFrontier
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -14,11 +20,46 @@ people = {}
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
 movies = {}
 
+# CompactGraph used instead of the dicts above when loaded with compact=True
+graph = None
 
-def load_data(directory):
+# Maps person_ids to the id of a representative of their connected
+# component in the co-star graph, so disconnected queries end at once
+components = {}
+
+# File next to the CSVs where `components` is saved between runs
+COMPONENTS_FILE = ".degrees_components.json"
+
+# NameIndex over whichever representation is loaded, built on first use
+_name_index = None
+
+# Ways to pick one person among several with the same name without asking
+POLICIES = ["most-connected", "first"]
+
+
+def load_data(directory, compact=False, cache=False):
     """
     Load data from CSV files into memory.
+
+    With `compact`, the data is loaded into an integer-indexed
+    CompactGraph instead of the `names`, `people` and `movies` dicts.
+    With `cache` as well, the graph is memory-mapped from an on-disk
+    snapshot that is rebuilt whenever the CSV files change.
+
+    Otherwise the connected components are saved next to the CSV files
+    and reused until they change.
     """
+    global graph, _name_index
+    _name_index = None
+    if compact:
+        from compact import CompactGraph, load_cached
+        if cache:
+            graph = load_cached(directory)
+        else:
+            graph = CompactGraph.from_csv(directory)
+        return
+    graph = None
+
     # Load people
     with open(f"{directory}/people.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
@@ -43,7 +84,16 @@ def load_data(directory):
                 "stars": set()
             }
 
-    # Load stars
+    from compact import csv_stamp
+    stamp = csv_stamp(directory)
+    saved = _load_components(directory, stamp)
+
+    # Load stars, joining each star's component with the movie's first
+    # star unless the components were saved by an earlier run
+    union_find = None
+    if saved is None:
+        union_find = {person_id: person_id for person_id in people}
+    first_stars = {}
     with open(f"{directory}/stars.csv", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
@@ -51,18 +101,118 @@ def load_data(directory):
                 people[row["person_id"]]["movies"].add(row["movie_id"])
                 movies[row["movie_id"]]["stars"].add(row["person_id"])
             except KeyError:
-                pass
+                continue
+            if union_find is not None:
+                first_star = first_stars.setdefault(row["movie_id"],
+                                                    row["person_id"])
+                _union(union_find, first_star, row["person_id"])
+
+    if saved is not None:
+        components.update(saved)
+        return
+    for person_id in people:
+        components[person_id] = _find(union_find, person_id)
+    _save_components(directory, stamp)
+
+
+def _load_components(directory, stamp):
+    """
+    Returns the components saved next to the CSV files in `directory`,
+    or None if there are none or the files have changed since.
+    """
+    try:
+        with open(os.path.join(directory, COMPONENTS_FILE),
+                  encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if saved.get("stamp") != stamp:
+        return None
+    return saved["components"]
+
+
+def _save_components(directory, stamp):
+    """
+    Saves `components` next to the CSV files in `directory`, if it can.
+    """
+    path = os.path.join(directory, COMPONENTS_FILE)
+    # Write to a scratch file first so readers never see half of it
+    scratch = f"{path}.tmp{os.getpid()}"
+    try:
+        with open(scratch, "w", encoding="utf-8") as f:
+            json.dump({"stamp": stamp, "components": components}, f)
+        os.replace(scratch, path)
+    except OSError:
+        pass
+
+
+def _find(union_find, person_id):
+    """
+    Returns the representative of a person's component, halving the
+    path to it on the way.
+    """
+    while union_find[person_id] != person_id:
+        union_find[person_id] = union_find[union_find[person_id]]
+        person_id = union_find[person_id]
+    return person_id
+
+
+def _union(union_find, person1, person2):
+    """
+    Merges the components of two people.
+    """
+    root1 = _find(union_find, person1)
+    root2 = _find(union_find, person2)
+    if root1 != root2:
+        union_find[root2] = root1
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "small"
+    parser = argparse.ArgumentParser(
+        usage="python degrees.py [directory] [--compact [--cache]] "
+              "[--batch FILE | --serve [HOST:]PORT]"
+    )
+    parser.add_argument("directory", nargs="?", default="small")
+    parser.add_argument("--compact", action="store_true",
+                        help="use the integer-indexed CSR graph")
+    parser.add_argument("--cache", action="store_true",
+                        help="reuse an on-disk snapshot of the CSR graph")
+    parser.add_argument("--max-degrees", type=int, default=None,
+                        help="report pairs further apart as not connected")
+    service = parser.add_mutually_exclusive_group()
+    service.add_argument("--batch", metavar="FILE",
+                         help="answer tab-separated name pairs from FILE "
+                              "('-' for stdin) as JSON lines")
+    service.add_argument("--serve", metavar="[HOST:]PORT",
+                         help="answer queries over HTTP on localhost")
+    parser.add_argument("--policy", choices=POLICIES,
+                        help="resolve unknown or ambiguous names in batch "
+                             "and server modes instead of reporting them")
+    args = parser.parse_args()
+    if args.cache and not args.compact:
+        parser.error("--cache requires --compact")
+    mode = "compact" if args.compact else "bidirectional"
 
-    # Load data from files into memory
-    print("Loading data...")
-    load_data(directory)
-    print("Data loaded.")
+    # Load data from files into memory, keeping stdout for results
+    log = sys.stdout if args.batch is None else sys.stderr
+    print("Loading data...", file=log)
+    load_data(args.directory, compact=args.compact, cache=args.cache)
+    print("Data loaded.", file=log)
+
+    if args.batch is not None:
+        if args.batch == "-":
+            run_batch(sys.stdin, sys.stdout, mode=mode, policy=args.policy,
+                      max_degrees=args.max_degrees)
+        else:
+            with open(args.batch, encoding="utf-8") as f:
+                run_batch(f, sys.stdout, mode=mode, policy=args.policy,
+                          max_degrees=args.max_degrees)
+        return
+    if args.serve is not None:
+        host, _, port = args.serve.rpartition(":")
+        serve(host or "127.0.0.1", int(port), mode=mode, policy=args.policy,
+              max_degrees=args.max_degrees)
+        return
 
     source = person_id_for_name(input("Name: "))
     if source is None:
@@ -71,7 +221,8 @@ def main():
     if target is None:
         sys.exit("Person not found.")
     start_time = time.time()
-    path = shortest_path(source, target)
+    path = shortest_path(source, target, mode=mode,
+                         max_degrees=args.max_degrees)
 
     if path is None:
         print("Not connected.")
@@ -80,39 +231,175 @@ def main():
         print(f"{degrees} degrees of separation.")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            person1 = person_record(path[i][1])["name"]
+            person2 = person_record(path[i + 1][1])["name"]
+            movie = movie_record(path[i + 1][0])["title"]
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
     print("Process finished --- %s seconds ---" % (time.time() - start_time))
 
-def shortest_path(source, target):
+
+def answer_query(source_name, target_name, mode="bidirectional",
+                 policy=None, max_degrees=None):
+    """
+    Answers one query without prompting, returning a dictionary
+    ready to be sent as JSON: the names asked for, and either an
+    `error`, or the `degrees` and `path` (None if not connected).
+    `latency_ms` is the time spent resolving names and searching.
+
+    Without a `policy`, names must match exactly one person; with one,
+    names are resolved by `resolve_person`.
+    """
+    start_time = time.perf_counter()
+    response = {"source": source_name, "target": target_name}
+
+    person_ids = []
+    for name in (source_name, target_name):
+        if policy is None:
+            candidates = person_ids_for_name(name)
+        else:
+            person_id = resolve_person(name, policy=policy)
+            candidates = [] if person_id is None else [person_id]
+        if len(candidates) != 1:
+            response["error"] = (f"person not found: {name}"
+                                 if not candidates else
+                                 f"ambiguous name: {name}")
+            response["candidates"] = candidates
+            break
+        person_ids.append(candidates[0])
+    else:
+        path = shortest_path(*person_ids, mode=mode,
+                             max_degrees=max_degrees)
+        response["degrees"] = None if path is None else len(path)
+        response["path"] = path
+
+    response["latency_ms"] = (time.perf_counter() - start_time) * 1000
+    return response
+
+
+def run_batch(infile, outfile, mode="bidirectional", policy=None,
+              max_degrees=None):
+    """
+    Reads one tab-separated pair of names per line from `infile`
+    and writes each answer to `outfile` as a line of JSON.
+    """
+    for line in infile:
+        line = line.rstrip("\n")
+        if not line.strip():
+            continue
+        names = line.split("\t")
+        if len(names) != 2:
+            response = {"input": line,
+                        "error": "expected two tab-separated names"}
+        else:
+            response = answer_query(names[0], names[1], mode=mode,
+                                    policy=policy, max_degrees=max_degrees)
+        outfile.write(json.dumps(response) + "\n")
+        outfile.flush()
+
+
+def serve(host, port, mode="bidirectional", policy=None,
+          max_degrees=None):
+    """
+    Serves queries over HTTP until interrupted, one thread per request:
+    GET /path?source=NAME&target=NAME returns the answer as JSON, and
+    GET /names?prefix=TEXT lists matching names for autocompletion.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            if (url.path == "/path"
+                    and len(query.get("source", [])) == 1
+                    and len(query.get("target", [])) == 1):
+                response = answer_query(query["source"][0],
+                                        query["target"][0],
+                                        mode=mode, policy=policy,
+                                        max_degrees=max_degrees)
+            elif (url.path == "/names"
+                    and len(query.get("prefix", [])) == 1):
+                response = name_index().prefix(query["prefix"][0])
+            else:
+                self.send_error(400, "use /path?source=NAME&target=NAME "
+                                     "or /names?prefix=TEXT")
+                return
+            body = json.dumps(response).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    # Build the name indexes now rather than during the first requests;
+    # only a policy ever looks names up by typo
+    name_index()
+    if policy is not None:
+        name_index().deletion_index()
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"Serving on http://{host}:{server.server_port}/path")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+def shortest_path(source, target, mode="bfs", max_degrees=None, stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
     Some of the code borrowed from Lecture 0 Example Code and modified
     If no possible path, returns None.
+
+    `mode` selects the search engine: "bfs" for the single-ended
+    breadth-first search, "bidirectional" to search from both ends,
+    "bipartite" to search people and movies scanning each cast once,
+    or "compact" to search the CompactGraph loaded with compact=True.
+    With `max_degrees`, paths longer than that are not searched for
+    and None is returned instead.
+
+    If a `stats` dictionary is given, the search records in it the
+    number of people `explored` and the `peak_frontier` size.
     """
+    if mode not in ("bfs", "bidirectional", "bipartite", "compact"):
+        raise ValueError(f"unknown search mode {mode!r}")
+    if stats is None:
+        stats = {}
+    stats.update(explored=0, peak_frontier=0)
+    if not connected(source, target):
+        return None
+    if mode == "bidirectional":
+        return bidirectional_shortest_path(source, target, max_degrees, stats)
+    elif mode == "bipartite":
+        return bipartite_shortest_path(source, target, max_degrees, stats)
+    elif mode == "compact":
+        return graph.shortest_path(source, target, max_degrees, stats)
+
     #Keep track of number of states explored.
     num_explored = 0
 
     #Initialize the frontier and use DFS
     start = Node(state=source, parent=None, action=None)
-    frontier = QueueFrontier()
+    frontier = DequeQueueFrontier()
     frontier.add(start)
 
     #Set of explored states
     explored = set()
 
+    #Degrees of separation of each state added to the frontier
+    depths = {source: 0}
+
     while True:
 
         #Check if the frontier is empty
         if frontier.empty():
-            raise Exception("no solution")
+            return None
 
         #remove node from frontier
+        stats["peak_frontier"] = max(stats["peak_frontier"],
+                                     len(frontier.frontier))
         node = frontier.remove()
         num_explored += 1
+        stats["explored"] = num_explored
 
         if node.state == target:
             actions = [] #movie ids
@@ -139,15 +426,201 @@ def shortest_path(source, target):
             return solution
 
         explored.add(node.state)
+        if max_degrees is not None and depths[node.state] >= max_degrees:
+            continue
         #actions are the movie_ids
         #states are the person_ids
         #Populate the Frontier
         for action, state in neighbors_for_person(node.state):
             if not frontier.contains_state(state) and state not in explored:
                 child = Node(state=state, parent=node, action=action)
+                depths[state] = depths[node.state] + 1
                 frontier.add(child)
-    # TODO
-    raise NotImplementedError
+
+
+def bidirectional_shortest_path(source, target, max_degrees=None,
+                                stats=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching breadth-first
+    from both ends at once and meeting in the middle.
+
+    Whole layers are expanded at a time, always on the side with the
+    smaller frontier, and the goal test happens when a person is
+    generated, so the first meeting found is a shortest path.
+    If no possible path (of at most `max_degrees`), returns None.
+    Search counters are recorded in `stats` as for `shortest_path`.
+    """
+    if stats is None:
+        stats = {}
+    stats.update(explored=0, peak_frontier=0)
+    if source == target:
+        return []
+
+    # Maps person_id -> (movie_id, person_id) of the step towards source
+    forward = {source: None}
+    # Maps person_id -> (movie_id, person_id) of the step towards target
+    backward = {target: None}
+    forward_layer = [source]
+    backward_layer = [target]
+
+    # Any path still to be found is longer than the two search depths
+    searched = 0
+
+    while forward_layer and backward_layer:
+        if max_degrees is not None and searched >= max_degrees:
+            return None
+        searched += 1
+        stats["peak_frontier"] = max(stats["peak_frontier"],
+                                     len(forward_layer) + len(backward_layer))
+        if len(forward_layer) <= len(backward_layer):
+            stats["explored"] += len(forward_layer)
+            meeting, forward_layer = _expand_layer(
+                forward_layer, forward, backward
+            )
+            if meeting is not None:
+                person_id, movie_id, neighbor_id = meeting
+                return (_path_to(forward, person_id)
+                        + [[movie_id, neighbor_id]]
+                        + _path_from(backward, neighbor_id))
+        else:
+            stats["explored"] += len(backward_layer)
+            meeting, backward_layer = _expand_layer(
+                backward_layer, backward, forward
+            )
+            if meeting is not None:
+                person_id, movie_id, neighbor_id = meeting
+                return (_path_to(forward, neighbor_id)
+                        + [[movie_id, person_id]]
+                        + _path_from(backward, person_id))
+
+    return None
+
+
+def bipartite_shortest_path(source, target, max_degrees=None, stats=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching breadth-first
+    over the bipartite graph of people and movies.
+
+    Movies are marked as visited along with people, so each movie's
+    cast is scanned at most once however many of its stars are
+    reached, and the target is tested for as people are generated.
+    If no possible path (of at most `max_degrees`), returns None.
+    Search counters are recorded in `stats` as for `shortest_path`.
+    """
+    if stats is None:
+        stats = {}
+    stats.update(explored=0, peak_frontier=0)
+    if source == target:
+        return []
+
+    parents = {source: None}
+    seen_movies = set()
+    layer = [source]
+    depth = 0
+
+    while layer:
+        if max_degrees is not None and depth >= max_degrees:
+            return None
+        depth += 1
+        stats["explored"] += len(layer)
+        stats["peak_frontier"] = max(stats["peak_frontier"], len(layer))
+        next_layer = []
+        for person_id in layer:
+            for movie_id in people[person_id]["movies"]:
+                if movie_id in seen_movies:
+                    continue
+                seen_movies.add(movie_id)
+                for star_id in movies[movie_id]["stars"]:
+                    if star_id in parents:
+                        continue
+                    parents[star_id] = (movie_id, person_id)
+                    if star_id == target:
+                        return _path_to(parents, target)
+                    next_layer.append(star_id)
+        layer = next_layer
+
+    return None
+
+
+def single_source_shortest_paths(source):
+    """
+    Runs one breadth-first search from `source` over the whole
+    component and returns (distances, parents): distances maps each
+    reachable person_id to its degrees of separation, and parents maps
+    it to the (movie_id, person_id) step it was reached from, or None
+    for the source. Use `path_to` to read off a path.
+    """
+    distances = {source: 0}
+    parents = {source: None}
+    layer = [source]
+    while layer:
+        next_layer = []
+        for person_id in layer:
+            for movie_id, neighbor_id in neighbors_for_person(person_id):
+                if neighbor_id not in parents:
+                    distances[neighbor_id] = distances[person_id] + 1
+                    parents[neighbor_id] = (movie_id, person_id)
+                    next_layer.append(neighbor_id)
+        layer = next_layer
+    return distances, parents
+
+
+def path_to(parents, target):
+    """
+    Returns the (movie_id, person_id) pairs leading to `target` from the
+    source of `parents`, or None if the target was not reached.
+    """
+    if target not in parents:
+        return None
+    return _path_to(parents, target)
+
+
+def _expand_layer(layer, visited, other):
+    """
+    Expands every person in `layer`, recording new people in `visited`.
+    Returns (meeting, next_layer) where meeting is a
+    (person_id, movie_id, neighbor_id) triple for the first neighbor
+    already reached by the `other` side, or None.
+    """
+    next_layer = []
+    for person_id in layer:
+        for movie_id, neighbor_id in neighbors_for_person(person_id):
+            if neighbor_id in visited:
+                continue
+            if neighbor_id in other:
+                return (person_id, movie_id, neighbor_id), next_layer
+            visited[neighbor_id] = (movie_id, person_id)
+            next_layer.append(neighbor_id)
+    return None, next_layer
+
+
+def _path_to(forward, person_id):
+    """
+    Follows `forward` links back to the source and returns the
+    (movie_id, person_id) pairs leading from the source to `person_id`.
+    """
+    path = []
+    while forward[person_id] is not None:
+        movie_id, parent_id = forward[person_id]
+        path.append([movie_id, person_id])
+        person_id = parent_id
+    path.reverse()
+    return path
+
+
+def _path_from(backward, person_id):
+    """
+    Follows `backward` links to the target and returns the
+    (movie_id, person_id) pairs leading from `person_id` to the target.
+    """
+    path = []
+    while backward[person_id] is not None:
+        movie_id, next_id = backward[person_id]
+        path.append([movie_id, next_id])
+        person_id = next_id
+    return path
 
 
 def person_id_for_name(name):
@@ -155,13 +628,13 @@ def person_id_for_name(name):
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    person_ids = person_ids_for_name(name)
     if len(person_ids) == 0:
         return None
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
-            person = people[person_id]
+            person = person_record(person_id)
             name = person["name"]
             birth = person["birth"]
             print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
@@ -176,6 +649,101 @@ def person_id_for_name(name):
         return person_ids[0]
 
 
+def resolve_person(name, policy="most-connected"):
+    """
+    Returns the IMDB id for a person's name without ever prompting,
+    or None if nobody matches.
+
+    A trailing birth year such as "Kevin Bacon (1958)" narrows the
+    candidates. If no name matches exactly, names one typo away are
+    tried. Any ambiguity left is settled by `policy`: "most-connected"
+    picks whoever starred in the most movies, "first" the lowest id.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"unknown policy {policy!r}")
+    birth = None
+    match = re.fullmatch(r"(.*?)\s*\((\d{4})\)", name.strip())
+    if match:
+        name, birth = match.groups()
+
+    person_ids = person_ids_for_name(name) or name_index().fuzzy(name)
+    if birth is not None:
+        born = [person_id for person_id in person_ids
+                if person_record(person_id)["birth"] == birth]
+        person_ids = born or person_ids
+    if not person_ids:
+        return None
+    if policy == "most-connected":
+        return max(person_ids, key=movie_count)
+    return min(person_ids, key=int)
+
+
+def name_index():
+    """
+    Returns the NameIndex over all loaded people, building it on first use.
+    """
+    global _name_index
+    if _name_index is None:
+        from nameindex import NameIndex
+        if graph is not None:
+            _name_index = NameIndex(graph.name_index, graph.person_ids)
+        else:
+            _name_index = NameIndex.from_pairs(
+                (person_id, person["name"])
+                for person_id, person in people.items()
+            )
+    return _name_index
+
+
+def movie_count(person_id):
+    """
+    Returns the number of movies a person starred in.
+    """
+    if graph is not None:
+        i = graph.person_index[person_id]
+        return int(graph.person_offsets[i + 1] - graph.person_offsets[i])
+    return len(people[person_id]["movies"])
+
+
+def connected(source, target):
+    """
+    Returns whether two people are in the same component of the
+    co-star graph, i.e. whether any path connects them.
+    """
+    if graph is not None:
+        return graph.connected(source, target)
+    return components[source] == components[target]
+
+
+def person_ids_for_name(name):
+    """
+    Returns the IMDB ids of every person with a given name.
+    """
+    if graph is not None:
+        return graph.person_ids_for_name(name)
+    return sorted(names.get(name.lower(), set()))
+
+
+def person_record(person_id):
+    """
+    Returns the dictionary with a person's name and birth,
+    from whichever representation has been loaded.
+    """
+    if graph is not None:
+        return graph.person(person_id)
+    return people[person_id]
+
+
+def movie_record(movie_id):
+    """
+    Returns the dictionary with a movie's title and year,
+    from whichever representation has been loaded.
+    """
+    if graph is not None:
+        return graph.movie(movie_id)
+    return movies[movie_id]
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
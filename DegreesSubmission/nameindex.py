@@ -0,0 +1,144 @@
+import numpy as np
+
+from compact import SortedIndex
+
+
+class NameIndex():
+    """
+    Sorted index of lowercase names for prefix and typo-tolerant lookup.
+
+    Names are held in a SortedIndex, so that a CompactGraph's own
+    `name_index` serves without copying any names. Exact and prefix
+    lookups search its sorted keys. Fuzzy lookups use a deletion index
+    (a hash of every name with one character removed, built on first
+    use), so only names sharing a deletion variant with the query are
+    ever compared.
+    """
+
+    def __init__(self, index, person_ids):
+        """
+        Builds the index from a SortedIndex over lowercase names and
+        the sequence of person ids its positions refer to.
+        """
+        self.index = index
+        self.person_ids = person_ids
+        self.deletions = None
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        """
+        Builds the index from (person_id, name) pairs.
+        """
+        person_ids = []
+        names = []
+        for person_id, name in pairs:
+            person_ids.append(person_id)
+            names.append(name.lower())
+        return cls(SortedIndex.build(names), person_ids)
+
+    def _ids(self, start, end):
+        """Returns the ids of the people at key positions start to end."""
+        return [self.person_ids[i] for i in self.index.order[start:end]]
+
+    def exact(self, name):
+        """Returns the ids of everyone called `name`."""
+        return [self.person_ids[i] for i in self.index.all(name.lower())]
+
+    def prefix(self, prefix, limit=10):
+        """
+        Returns up to `limit` (name, person_ids) pairs for the names
+        starting with `prefix`, in alphabetical order.
+        """
+        keys = self.index.keys
+        prefix = prefix.lower().encode()
+        i = int(np.searchsorted(keys, prefix, side="left"))
+        matches = []
+        while (i < len(keys) and len(matches) < limit
+               and keys[i].startswith(prefix)):
+            end = int(np.searchsorted(keys, keys[i], side="right"))
+            matches.append((keys[i].decode(), self._ids(i, end)))
+            i = end
+        return matches
+
+    def deletion_index(self):
+        """
+        Returns the deletion index, building it on first use: a sorted
+        array of the hashes of every deletion variant of every name,
+        and an array of the key position of the name each comes from.
+        """
+        if self.deletions is None:
+            keys = self.index.keys
+            if len(keys):
+                starts = np.flatnonzero(
+                    np.concatenate([[True], keys[1:] != keys[:-1]])
+                ).astype(np.int32)
+            else:
+                starts = np.zeros(0, dtype=np.int32)
+            counts = []
+
+            def hashes():
+                for key in keys[starts].tolist():
+                    variants = _deletions(key.decode())
+                    counts.append(len(variants))
+                    for variant in variants:
+                        yield hash(variant)
+
+            variants = np.fromiter(hashes(), dtype=np.int64)
+            positions = np.repeat(starts, counts)
+            order = np.argsort(variants, kind="stable")
+            # Publish the index only once it is complete, as other
+            # threads may be looking names up meanwhile
+            self.deletions = (variants[order], positions[order])
+        return self.deletions
+
+    def fuzzy(self, name):
+        """
+        Returns the ids of everyone whose name is within one insertion,
+        deletion, substitution or adjacent transposition of `name`,
+        exact matches first.
+        """
+        variants, positions = self.deletion_index()
+        keys = self.index.keys
+        name = name.lower()
+        candidates = set()
+        for variant in _deletions(name):
+            key = hash(variant)
+            start = np.searchsorted(variants, key, side="left")
+            end = np.searchsorted(variants, key, side="right")
+            candidates.update(positions[start:end].tolist())
+        # Hashes may collide, so every candidate is checked
+        matches = sorted(
+            (distance, i) for distance, i in (
+                (_distance(name, keys[i].decode()), i) for i in candidates
+            ) if distance <= 1
+        )
+        ids = []
+        for _, i in matches:
+            end = int(np.searchsorted(keys, keys[i], side="right"))
+            ids.extend(self._ids(i, end))
+        return ids
+
+
+def _deletions(word):
+    """Returns `word` and every string made by deleting one character."""
+    return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def _distance(a, b):
+    """
+    Returns the optimal string alignment distance between `a` and `b`:
+    the edit distance counting adjacent transpositions as one edit.
+    """
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1,
+                             previous[j - 1] + cost)
+            if (i > 1 and j > 1 and a[i - 1] == b[j - 2]
+                    and a[i - 2] == b[j - 1]):
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        previous2, previous = previous, current
+    return previous[len(b)]
@@ -0,0 +1,77 @@
+import argparse
+import json
+import sys
+from multiprocessing import Pool
+
+import numpy as np
+
+from compact import load_cached
+
+# CompactGraph of each worker process, memory-mapped from the snapshot
+graph = None
+
+
+def source_stats(graph, source_id):
+    """
+    Returns separation statistics for one person from a single BFS:
+    how many people are reachable, the eccentricity (largest degrees
+    of separation to anyone reachable) and how many people sit at each
+    number of degrees. An id not in the dataset gets an `error` instead.
+    """
+    if source_id not in graph.person_index:
+        return {"source": source_id, "error": "unknown person"}
+    distance, _, _ = graph.bfs(graph.person_index[source_id])
+    reached = distance[distance >= 0]
+    return {
+        "source": source_id,
+        "reachable": int(len(reached) - 1),
+        "eccentricity": int(reached.max()),
+        "histogram": np.bincount(reached).tolist()
+    }
+
+
+def separation_stats(directory, source_ids, processes=None, chunksize=8):
+    """
+    Yields `source_stats` for every person in `source_ids`, spreading
+    the searches over a pool of `processes` worker processes.
+
+    The graph is shared rather than pickled to each task: the snapshot
+    is built once here, and every worker memory-maps the same files, so
+    the operating system keeps a single copy of the arrays.
+    Results are yielded as they finish, not in input order.
+    """
+    load_cached(directory)
+    with Pool(processes, initializer=_init_worker,
+              initargs=(directory,)) as pool:
+        yield from pool.imap_unordered(_worker_stats, source_ids, chunksize)
+
+
+def _init_worker(directory):
+    global graph
+    graph = load_cached(directory)
+
+
+def _worker_stats(source_id):
+    return source_stats(graph, source_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compute degrees of separation statistics for many "
+                    "people at once, one JSON line per person."
+    )
+    parser.add_argument("directory")
+    parser.add_argument("person_ids", nargs="*",
+                        help="IMDB ids (read from stdin if omitted)")
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    person_ids = args.person_ids or [line.strip() for line in sys.stdin
+                                     if line.strip()]
+    for stats in separation_stats(args.directory, person_ids,
+                                  processes=args.processes):
+        print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
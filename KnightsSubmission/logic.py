@@ -11,9 +11,21 @@ class Sentence():
         """Returns string formula representing logical sentence."""
         return ""
 
+    def operands(self):
+        """Returns the sentences this sentence is built from."""
+        return []
+
     def symbols(self):
         """Returns a set of all symbols in the logical sentence."""
-        return set()
+        symbols = set()
+        stack = [self]
+        while stack:
+            sentence = stack.pop()
+            if isinstance(sentence, Symbol):
+                symbols.add(sentence.name)
+            else:
+                stack.extend(sentence.operands())
+        return symbols
 
     @classmethod
     def validate(cls, sentence):
@@ -65,9 +77,6 @@ class Symbol(Sentence):
     def formula(self):
         return self.name
 
-    def symbols(self):
-        return {self.name}
-
 
 class Not(Sentence):
     def __init__(self, operand):
@@ -89,8 +98,8 @@ class Not(Sentence):
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
-    def symbols(self):
-        return self.operand.symbols()
+    def operands(self):
+        return [self.operand]
 
 
 class And(Sentence):
@@ -126,8 +135,8 @@ class And(Sentence):
         return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
                            for conjunct in self.conjuncts])
 
-    def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+    def operands(self):
+        return self.conjuncts
 
 
 class Or(Sentence):
@@ -157,8 +166,8 @@ class Or(Sentence):
         return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
                             for disjunct in self.disjuncts])
 
-    def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+    def operands(self):
+        return self.disjuncts
 
 
 class Implication(Sentence):
@@ -188,8 +197,8 @@ class Implication(Sentence):
         consequent = Sentence.parenthesize(self.consequent.formula())
         return f"{antecedent} => {consequent}"
 
-    def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+    def operands(self):
+        return [self.antecedent, self.consequent]
 
 
 class Biconditional(Sentence):
@@ -211,18 +220,15 @@ class Biconditional(Sentence):
         return f"Biconditional({self.left}, {self.right})"
 
     def evaluate(self, model):
-        return ((self.left.evaluate(model)
-                 and self.right.evaluate(model))
-                or (not self.left.evaluate(model)
-                    and not self.right.evaluate(model)))
+        return self.left.evaluate(model) == self.right.evaluate(model)
 
     def formula(self):
         left = Sentence.parenthesize(str(self.left))
         right = Sentence.parenthesize(str(self.right))
         return f"{left} <=> {right}"
 
-    def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
+    def operands(self):
+        return [self.left, self.right]
 
 
 def model_check(knowledge, query):
@@ -261,3 +267,152 @@ def model_check(knowledge, query):
 
     # Check that knowledge entails query
     return check_all(knowledge, query, symbols, dict())
+
+
+# Clauses a CNF may grow to while distributing before it gives up
+MAX_CLAUSES = 4096
+
+
+class CNF():
+    """
+    A sentence compiled to conjunctive normal form over numbered
+    variables, for fast evaluation.
+
+    The clauses are found by distributing disjunctions over
+    conjunctions, which can make exponentially many of them: a chain
+    of k biconditionals, or an Or of k two-literal Ands, gives 2 ** k
+    or more. Compiling a sentence that needs more than `max_clauses`
+    raises an exception rather than exhausting memory.
+
+    Variable i is the symbol named `variables[i]`, and a model is an
+    integer whose bit i is the variable's value. Each clause is a pair
+    of masks (pos, neg) of the variables appearing in it unnegated and
+    negated, and holds in model m if m & pos or ~m & neg is nonzero.
+    """
+
+    def __init__(self, sentence, variables=None, max_clauses=MAX_CLAUSES):
+        if variables is None:
+            variables = sorted(sentence.symbols())
+        self.variables = list(variables)
+        self.index = {name: i for i, name in enumerate(self.variables)}
+        self.max_clauses = max_clauses
+        self.clauses = list(dict.fromkeys(self.compile(sentence, True)))
+
+    def compile(self, sentence, positive):
+        """
+        Returns the clauses of `sentence`, or of its negation if not
+        `positive`, dropping clauses that always hold.
+        """
+        if isinstance(sentence, Symbol):
+            try:
+                bit = 1 << self.index[sentence.name]
+            except KeyError:
+                raise Exception(f"variable {sentence.name} not in model")
+            return [(bit, 0)] if positive else [(0, bit)]
+        if isinstance(sentence, Not):
+            return self.compile(sentence.operand, not positive)
+        if isinstance(sentence, Implication):
+            return self.compile(
+                Or(Not(sentence.antecedent), sentence.consequent), positive
+            )
+        if isinstance(sentence, Biconditional):
+            left, right = sentence.left, sentence.right
+            if positive:
+                rewritten = And(Or(Not(left), right), Or(left, Not(right)))
+            else:
+                rewritten = And(Or(left, right), Or(Not(left), Not(right)))
+            return self.compile(rewritten, True)
+        if isinstance(sentence, (And, Or)):
+            conjunction = isinstance(sentence, And) == positive
+            parts = [self.compile(operand, positive)
+                     for operand in sentence.operands()]
+            if conjunction:
+                return [clause for part in parts for clause in part]
+            # A disjunction of conjunctions: distribute
+            clauses = [(0, 0)]
+            for part in parts:
+                product = []
+                for pos, neg in clauses:
+                    product.extend(
+                        (pos | other_pos, neg | other_neg)
+                        for other_pos, other_neg in part
+                        if not (pos | other_pos) & (neg | other_neg)
+                    )
+                    if len(product) > self.max_clauses:
+                        raise Exception(
+                            f"sentence needs more than {self.max_clauses} "
+                            f"clauses in CNF"
+                        )
+                clauses = product
+            return clauses
+        raise Exception(f"cannot compile {sentence!r}")
+
+    def assignment(self, model):
+        """Returns the model integer of a model dictionary."""
+        assignment = 0
+        for name, i in self.index.items():
+            try:
+                if model[name]:
+                    assignment |= 1 << i
+            except KeyError:
+                raise Exception(f"variable {name} not in model")
+        return assignment
+
+    def evaluate(self, assignment):
+        """Evaluates the sentence in the model integer `assignment`."""
+        for pos, neg in self.clauses:
+            if not (assignment & pos or ~assignment & neg):
+                return False
+        return True
+
+    def truth_table(self):
+        """
+        Returns an integer whose bit m is set if the sentence holds in
+        model m, for each of the 2 ** len(variables) models.
+
+        Each variable's values in every model are held as the bits of
+        one integer, so each literal of each clause is evaluated in all
+        models at once with a single bit operation.
+        """
+        models = 1 << len(self.variables)
+        full = (1 << models) - 1
+        columns = []
+        negated = []
+        for i in range(len(self.variables)):
+            # 2 ** i models with the variable false, then 2 ** i true,
+            # repeated by doubling until it covers every model
+            column = ((1 << (1 << i)) - 1) << (1 << i)
+            width = 1 << (i + 1)
+            while width < models:
+                column |= column << width
+                width *= 2
+            columns.append(column)
+            negated.append(full ^ column)
+
+        table = full
+        for pos, neg in self.clauses:
+            clause = 0
+            while pos:
+                clause |= columns[(pos & -pos).bit_length() - 1]
+                pos &= pos - 1
+            while neg:
+                clause |= negated[(neg & -neg).bit_length() - 1]
+                neg &= neg - 1
+            table &= clause
+            if not table:
+                break
+        return table
+
+
+def compiled_model_check(knowledge, query):
+    """
+    Checks if knowledge base entails query, like `model_check`, but by
+    compiling both to CNF and evaluating them in every model at once.
+    Raises an exception for a sentence whose CNF would have more than
+    MAX_CLAUSES clauses (see `CNF`).
+    """
+    variables = sorted(set.union(knowledge.symbols(), query.symbols()))
+    models = (1 << (1 << len(variables))) - 1
+    knowledge = CNF(knowledge, variables).truth_table()
+    query = CNF(query, variables).truth_table()
+    return knowledge & (models ^ query) == 0
@@ -0,0 +1,218 @@
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# PageRank engines to compare, and whether each samples rather than iterates
+ENGINES = {
+    "sample": True,
+    "iterate": False,
+    "parallel": False,
+    "outofcore": False
+}
+
+DAMPING = 0.85
+
+
+class SweepHistory(list):
+    """
+    History list for the engines' `history` argument that also records
+    how long each sweep took, from when the list was created.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.seconds = []
+        self.last = time.perf_counter()
+
+    def append(self, residual):
+        now = time.perf_counter()
+        self.seconds.append(now - self.last)
+        self.last = now
+        super().append(residual)
+
+
+def generate(directory, num_pages, links=5.0, attachment=0.8,
+             dangling=0.05, seed=0):
+    """
+    Writes a synthetic corpus of `num_pages` HTML pages to `directory`.
+
+    Pages link to a geometric number of pages, `links` on average,
+    except for a `dangling` fraction of pages with no links at all.
+    Each link goes with probability `attachment` to a page chosen in
+    proportion to the links it already has (preferential attachment,
+    which gives the scale-free in-degrees of real link graphs), and
+    otherwise to any page chosen uniformly.
+    """
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    # Every page appears once per incoming link, plus once to start with
+    linked = list(range(num_pages))
+    for page in range(num_pages):
+        targets = set()
+        if rng.random() >= dangling:
+            count = 1
+            while rng.random() > 1 / links:
+                count += 1
+            for _ in range(min(count, num_pages - 1)):
+                if rng.random() < attachment:
+                    target = rng.choice(linked)
+                else:
+                    target = rng.randrange(num_pages)
+                if target != page:
+                    targets.add(target)
+        linked.extend(targets)
+        with open(os.path.join(directory, f"{page}.html"), "w",
+                  encoding="utf-8") as f:
+            f.write("<html><body>\n")
+            for target in sorted(targets):
+                f.write(f'<a href="{target}.html">{target}</a>\n')
+            f.write("</body></html>\n")
+
+
+def run_engine(directory, engine, samples, processes, tolerance):
+    """
+    Crawls `directory` and computes its PageRank with `engine`,
+    returning the ranks and the measurements as a dictionary.
+    Meant to run in a fresh process so peak RSS belongs to one engine;
+    the peak RSS of its children is that of the largest worker process
+    it started, to crawl or to iterate.
+    """
+    from crawler import crawl_graph
+    from linkgraph import power_iteration, sample_ranks
+    from outofcore import build_store, stream_power_iteration
+    from parallel import parallel_power_iteration
+
+    with tempfile.TemporaryDirectory() as store:
+        start = time.perf_counter()
+        if engine == "outofcore":
+            build_store(directory, store, processes)
+        else:
+            graph = crawl_graph(directory, processes)
+        load_seconds = time.perf_counter() - start
+
+        history = SweepHistory()
+        start = time.perf_counter()
+        if engine == "sample":
+            ranks = sample_ranks(graph, DAMPING, samples, seed=0)
+        elif engine == "iterate":
+            ranks = power_iteration(graph, DAMPING, tolerance,
+                                    history=history)
+        elif engine == "parallel":
+            ranks = parallel_power_iteration(graph, DAMPING, tolerance,
+                                             processes=processes,
+                                             history=history)
+        else:
+            ranks = stream_power_iteration(store, DAMPING, tolerance,
+                                           history=history)
+        rank_seconds = time.perf_counter() - start
+
+    return {
+        "engine": engine,
+        "load_seconds": load_seconds,
+        "rank_seconds": rank_seconds,
+        "iterations": len(history),
+        "seconds_per_iteration": (rank_seconds / len(history)
+                                  if history else None),
+        "residuals": [float(residual) for residual in history],
+        "sweep_seconds": history.seconds,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "peak_children_rss_kb":
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        "ranks": ranks
+    }
+
+
+def agreement(ranks, reference, top=10):
+    """
+    Returns how closely `ranks` matches `reference`: their L1 and
+    largest differences, and the fraction of the `top` best pages of
+    `reference` that are also among the `top` best pages of `ranks`.
+    """
+    top = min(top, len(reference))
+    best = set(np.argsort(-reference, kind="stable")[:top].tolist())
+    found = set(np.argsort(-ranks, kind="stable")[:top].tolist())
+    return {
+        "l1": float(np.abs(ranks - reference).sum()),
+        "max": float(np.abs(ranks - reference).max()),
+        f"top_{top}_overlap": len(best & found) / top if top else 1.0
+    }
+
+
+def benchmark(directory, engines, samples, processes=None,
+              tolerance=1e-8):
+    """
+    Runs every engine in its own process over the corpus in `directory`
+    and returns their results, with each engine's agreement with the
+    first iterative engine given (or the first engine, if none is).
+    """
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for engine in engines:
+        # Not a Pool: its workers cannot start pools of their own
+        with ProcessPoolExecutor(1, mp_context=context) as executor:
+            results.append(executor.submit(
+                run_engine, directory, engine, samples, processes, tolerance
+            ).result())
+
+    iterative = [result for result in results
+                 if not ENGINES[result["engine"]]]
+    reference = (iterative or results)[0]
+    for result in results:
+        result["reference"] = reference["engine"]
+        result["agreement"] = agreement(result["ranks"], reference["ranks"])
+    for result in results:
+        del result["ranks"]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the PageRank engines on a synthetic "
+                    "scale-free corpus and print the results as JSON."
+    )
+    parser.add_argument("--pages", type=int, default=10000)
+    parser.add_argument("--links", type=float, default=5.0,
+                        help="mean number of links per page")
+    parser.add_argument("--attachment", type=float, default=0.8,
+                        help="fraction of links placed by preferential "
+                             "attachment")
+    parser.add_argument("--dangling", type=float, default=0.05,
+                        help="fraction of pages with no links")
+    parser.add_argument("--samples", type=int, default=1000000)
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--tolerance", type=float, default=1e-8)
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES),
+                        default=list(ENGINES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--directory",
+                        help="keep the generated HTML pages here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        directory = args.directory or scratch
+        generate(directory, args.pages, links=args.links,
+                 attachment=args.attachment, dangling=args.dangling,
+                 seed=args.seed)
+        results = benchmark(directory, args.engines, args.samples,
+                            processes=args.processes,
+                            tolerance=args.tolerance)
+
+    print(json.dumps({
+        "pages": args.pages,
+        "links": args.links,
+        "attachment": args.attachment,
+        "dangling": args.dangling,
+        "results": results
+    }, indent=4))
+
+
+if __name__ == "__main__":
+    main()
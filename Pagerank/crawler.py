@@ -0,0 +1,122 @@
+import os
+import re
+from array import array
+from multiprocessing import Pool
+
+import numpy as np
+
+from linkgraph import LinkGraph
+
+# Same pattern as `crawl`, matched against raw bytes
+LINK = re.compile(rb"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+CHUNK_SIZE = 1 << 16
+
+# Longest unfinished tag carried between chunks before it is given up on
+MAX_TAG = 1 << 16
+
+# Maps page names to page indices in each worker process
+index = None
+
+
+def page_links(path, chunk_size=CHUNK_SIZE):
+    """
+    Return the set of link targets in the HTML file at `path`, reading
+    it `chunk_size` bytes at a time rather than all at once.
+
+    Whatever follows the last complete match, from the last "<a" on,
+    is carried over to the next chunk so that tags split across chunk
+    boundaries are still found.
+    """
+    links = set()
+    carry = b""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            buffer = carry + chunk
+            end = 0
+            for match in LINK.finditer(buffer):
+                links.add(match.group(1).decode(errors="replace"))
+                end = match.end()
+            start = buffer.rfind(b"<a", end)
+            if start == -1 and buffer.endswith(b"<"):
+                start = len(buffer) - 1
+            carry = buffer[start:] if start != -1 else b""
+            if len(carry) > MAX_TAG:
+                # Longer than any real tag; drop it rather than grow forever
+                carry = b""
+    return links
+
+
+def crawl_graph(directory, processes=None, chunk_size=CHUNK_SIZE):
+    """
+    Parse a directory of HTML pages into a LinkGraph, like `crawl`
+    but without building a dictionary of sets of page names.
+
+    Pages are numbered in sorted filename order and parsed in a pool of
+    `processes` worker processes, each streaming its files in chunks
+    and returning the sorted indices of the corpus pages each links to.
+    Links to pages outside the corpus and to the page itself are dropped.
+    """
+    names = page_names(directory)
+    offsets = array("q", [0])
+    targets = array("i")
+    for links in crawl_targets(directory, names, processes, chunk_size):
+        targets.extend(links)
+        offsets.append(len(targets))
+
+    return LinkGraph(names,
+                     np.frombuffer(offsets, dtype=np.int64),
+                     np.frombuffer(targets, dtype=np.int32))
+
+
+def page_names(directory):
+    """
+    Return the names of the HTML pages in `directory`, in sorted order.
+    """
+    return sorted(
+        filename for filename in os.listdir(directory)
+        if filename.endswith(".html")
+    )
+
+
+def corpus_stamp(directory):
+    """
+    Return the sorted page names of `directory` with each page's size
+    and modification time, to tell whether a store built from the
+    corpus is still current.
+    """
+    stamp = []
+    for name in page_names(directory):
+        info = os.stat(os.path.join(directory, name))
+        stamp.append([name, info.st_size, info.st_mtime_ns])
+    return stamp
+
+
+def crawl_targets(directory, names, processes=None, chunk_size=CHUNK_SIZE):
+    """
+    Parse the pages `names` in `directory` in a pool of `processes`
+    worker processes, yielding the sorted indices into `names` of the
+    pages each one links to, in the order of `names`.
+    """
+    pages = {name: i for i, name in enumerate(names)}
+    paths = [os.path.join(directory, name) for name in names]
+    with Pool(processes, initializer=_init_worker,
+              initargs=(pages,)) as pool:
+        tasks = [(i, path, chunk_size) for i, path in enumerate(paths)]
+        yield from pool.imap(_page_targets, tasks, chunksize=64)
+
+
+def _init_worker(pages):
+    global index
+    index = pages
+
+
+def _page_targets(task):
+    page, path, chunk_size = task
+    return sorted(
+        index[link] for link in page_links(path, chunk_size)
+        if link in index and index[link] != page
+    )
@@ -0,0 +1,249 @@
+import json
+import math
+import os
+from functools import cached_property
+
+import numpy as np
+
+
+class LinkGraph():
+    """
+    Link graph of a corpus with pages interned to dense integers.
+
+    Outgoing links are stored as CSR adjacency: the links of page i
+    are `targets[offsets[i]:offsets[i + 1]]`, and `names[i]` is the
+    page's filename.
+
+    A graph saved to a store directory holds offsets.npy, targets.npy
+    and names.txt (one page name per line), and rank vectors computed
+    for it can be saved alongside as <name>.npy. A stamp.json records
+    the corpus the store was built from.
+    """
+
+    def __init__(self, names, offsets, targets):
+        self.names = names
+        self.offsets = offsets
+        self.targets = targets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Build a LinkGraph from a corpus dictionary as returned by `crawl`,
+        mapping each page to the set of pages it links to.
+        """
+        names = sorted(corpus)
+        index = {name: i for i, name in enumerate(names)}
+        offsets = np.zeros(len(names) + 1, dtype=np.int64)
+        targets = []
+        for i, name in enumerate(names):
+            links = sorted(index[link] for link in corpus[name])
+            targets.extend(links)
+            offsets[i + 1] = offsets[i] + len(links)
+        return cls(names, offsets, np.array(targets, dtype=np.int32))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a LinkGraph saved with `save`, memory-mapping its arrays.
+        """
+        offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        targets = np.load(os.path.join(path, "targets.npy"), mmap_mode="r")
+        with open(os.path.join(path, "names.txt"), encoding="utf-8") as f:
+            names = f.read().split("\n")[:-1]
+        if len(names) != len(offsets) - 1:
+            raise ValueError(f"corrupt link graph store {path!r}")
+        return cls(names, offsets, targets)
+
+    def save(self, path):
+        """
+        Save the graph to store directory `path`.
+        """
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "offsets.npy"), self.offsets)
+        np.save(os.path.join(path, "targets.npy"), self.targets)
+        with open(os.path.join(path, "names.txt"), "w",
+                  encoding="utf-8") as f:
+            for name in self.names:
+                f.write(name + "\n")
+
+    @cached_property
+    def index(self):
+        """Maps page names to page indices."""
+        return {name: i for i, name in enumerate(self.names)}
+
+    @cached_property
+    def out_degree(self):
+        """Number of links on each page."""
+        return np.diff(self.offsets)
+
+    @cached_property
+    def sources(self):
+        """Page each entry of `targets` is linked from."""
+        return np.repeat(np.arange(len(self), dtype=np.int32),
+                         self.out_degree)
+
+    def to_dict(self, ranks):
+        """
+        Return a dictionary mapping page names to their value in `ranks`.
+        """
+        return {name: float(rank) for name, rank in zip(self.names, ranks)}
+
+
+def save_ranks(path, name, ranks):
+    """
+    Save a rank vector under `name` in store directory `path`.
+    """
+    np.save(os.path.join(path, f"{name}.npy"), np.asarray(ranks))
+
+
+def load_ranks(path, name):
+    """
+    Return the rank vector saved under `name` in store directory `path`,
+    memory-mapped, or None if there is none.
+    """
+    try:
+        return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+    except FileNotFoundError:
+        return None
+
+
+def load_stamp(path):
+    """
+    Return the corpus stamp saved in store directory `path`, or None if
+    there is none.
+    """
+    try:
+        with open(os.path.join(path, "stamp.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_stamp(path, stamp):
+    """
+    Save the stamp of the corpus the store at `path` was built from.
+    Save it last, once the rest of the store is complete.
+    """
+    with open(os.path.join(path, "stamp.json"), "w") as f:
+        json.dump(stamp, f)
+
+
+def clear_store(path):
+    """
+    Remove the stamp and every saved rank vector from store directory
+    `path`, before it is rebuilt for another corpus.
+    """
+    if not os.path.isdir(path):
+        return
+    for filename in os.listdir(path):
+        if filename == "stamp.json" or (
+                filename.endswith(".npy")
+                and filename not in ("offsets.npy", "targets.npy")):
+            os.remove(os.path.join(path, filename))
+
+
+def power_iteration(graph, damping_factor, tolerance=1e-8,
+                    max_iterations=1000, ranks=None, history=None,
+                    teleport=None):
+    """
+    Return the PageRank vector of `graph` by power iteration.
+
+    Each sweep multiplies the ranks by the column-stochastic link matrix,
+    held sparsely as the graph's edge arrays, so a sweep costs O(links).
+    A page with no links is treated as linking to every page, including
+    itself. Iteration starts from `ranks` (uniform by default) and stops
+    once the L1 change between sweeps falls below `tolerance`, or after
+    `max_iterations` sweeps. If a `history` list is given, the L1
+    change of each sweep is appended to it.
+
+    `teleport` is the distribution random jumps land on, uniform by
+    default; pages with no links then jump according to it as well.
+    Giving one concentrated on some seed pages yields their
+    personalized PageRank.
+    """
+    n = len(graph)
+    out_degree = graph.out_degree
+    dangling = out_degree == 0
+    inverse_degree = np.zeros(n)
+    inverse_degree[~dangling] = 1 / out_degree[~dangling]
+
+    if teleport is None:
+        teleport = np.full(n, 1 / n)
+    if ranks is None:
+        ranks = np.full(n, 1 / n)
+    else:
+        ranks = np.asarray(ranks, dtype=np.float64)
+
+    for _ in range(max_iterations):
+        shares = (ranks * inverse_degree)[graph.sources]
+        new_ranks = (np.bincount(graph.targets, weights=shares, minlength=n)
+                     + ranks[dangling].sum() * teleport)
+        new_ranks = ((1 - damping_factor) * teleport
+                     + damping_factor * new_ranks)
+        residual = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if history is not None:
+            history.append(residual)
+        if residual < tolerance:
+            break
+
+    return ranks
+
+
+# Largest bias toward a surfer's random starting page left by burn-in
+BURN_IN_BIAS = 1e-3
+
+
+def sample_ranks(graph, damping_factor, n, surfers=1024, seed=None):
+    """
+    Return PageRank estimates for `graph` from `n` samples of the
+    random surfer model, as the fraction of samples landing on each page.
+
+    The samples are spread over up to `surfers` independent surfers,
+    each starting on a page chosen at random, that all take their next
+    step together as NumPy array operations on the CSR link arrays.
+    With probability `damping_factor` a surfer follows a random link on
+    its page, otherwise (or if the page has no links) it jumps to a
+    random page. `seed` makes the samples reproducible.
+
+    A surfer's starting page only stops mattering once it has jumped
+    at random at least once, so every surfer first takes enough steps
+    unrecorded for the chance of never having jumped to fall below
+    BURN_IN_BIAS.
+    """
+    rng = np.random.default_rng(seed)
+    pages = len(graph)
+    surfers = max(min(surfers, n), 1)
+    out_degree = graph.out_degree
+    counts = np.zeros(pages, dtype=np.int64)
+
+    if damping_factor <= 0:
+        burn_in = 0
+    elif damping_factor >= 1:
+        burn_in = 1000
+    else:
+        burn_in = math.ceil(math.log(BURN_IN_BIAS)
+                            / math.log(damping_factor))
+
+    current = rng.integers(0, pages, size=surfers)
+    recorded = 0
+    step = 0
+    while recorded < n:
+        if step >= burn_in:
+            taken = min(surfers, n - recorded)
+            counts += np.bincount(current[:taken], minlength=pages)
+            recorded += taken
+        step += 1
+
+        degree = out_degree[current]
+        follow = (rng.random(surfers) < damping_factor) & (degree > 0)
+        choice = (rng.random(surfers) * degree).astype(np.int64)
+        following = current[follow]
+        current = rng.integers(0, pages, size=surfers)
+        current[follow] = graph.targets[graph.offsets[following]
+                                        + choice[follow]]
+
+    return counts / n
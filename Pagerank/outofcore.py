@@ -0,0 +1,128 @@
+import os
+
+import numpy as np
+
+from crawler import CHUNK_SIZE, crawl_targets, page_names
+
+# Links read from disk at a time by `stream_power_iteration`
+CHUNK_LINKS = 1 << 22
+
+# Widest range of pages, per link in a chunk, counted with a bincount
+SPREAD = 4
+
+
+def build_store(directory, path, processes=None, chunk_size=CHUNK_SIZE):
+    """
+    Crawl the HTML pages in `directory` straight into a LinkGraph store
+    at `path`, without holding the corpus's links in memory.
+
+    Each page's links are appended to a scratch file as soon as it is
+    parsed, so only one integer per page (its offset) is kept; the
+    scratch file is then copied into targets.npy in chunks. The store
+    has the same layout as `LinkGraph.save` writes: its targets.npy is
+    the link list sorted by source page, read back by
+    `stream_power_iteration`.
+    """
+    os.makedirs(path, exist_ok=True)
+    names = page_names(directory)
+    scratch = os.path.join(path, "targets.tmp")
+    offsets = np.zeros(len(names) + 1, dtype=np.int64)
+    with open(scratch, "wb") as f:
+        links = crawl_targets(directory, names, processes, chunk_size)
+        for page, targets in enumerate(links):
+            f.write(np.asarray(targets, dtype=np.int32).tobytes())
+            offsets[page + 1] = offsets[page] + len(targets)
+
+    targets = np.lib.format.open_memmap(
+        os.path.join(path, "targets.npy"), mode="w+", dtype=np.int32,
+        shape=(int(offsets[-1]),)
+    )
+    with open(scratch, "rb") as f:
+        for start in range(0, len(targets), CHUNK_LINKS):
+            chunk = np.fromfile(f, dtype=np.int32, count=CHUNK_LINKS)
+            targets[start:start + len(chunk)] = chunk
+    targets.flush()
+    del targets
+    os.remove(scratch)
+
+    np.save(os.path.join(path, "offsets.npy"), offsets)
+    with open(os.path.join(path, "names.txt"), "w", encoding="utf-8") as f:
+        for name in names:
+            f.write(name + "\n")
+
+
+def stream_power_iteration(path, damping_factor, tolerance=1e-8,
+                           max_iterations=1000, chunk_links=CHUNK_LINKS,
+                           history=None):
+    """
+    Return the PageRank vector of the LinkGraph store at `path`, like
+    `power_iteration`, reading the link list from disk `chunk_links`
+    links at a time on every sweep instead of loading it.
+
+    Only per-page vectors (offsets, ranks and inverse link counts) are
+    held in memory. Because the links are sorted by source page, the
+    pages a chunk's links come from are a run of consecutive pages,
+    recovered from the offsets. A page with no links is treated as
+    linking to every page, including itself, and iteration stops once
+    the L1 change between sweeps falls below `tolerance`.
+    """
+    offsets = np.load(os.path.join(path, "offsets.npy"))
+    n = len(offsets) - 1
+    out_degree = np.diff(offsets)
+    dangling = out_degree == 0
+    inverse_degree = np.zeros(n)
+    inverse_degree[~dangling] = 1 / out_degree[~dangling]
+    del out_degree
+
+    ranks = np.full(n, 1 / n)
+    for _ in range(max_iterations):
+        shares = ranks * inverse_degree
+        new_ranks = np.zeros(n)
+        for sources, targets in _chunks(path, offsets, chunk_links):
+            if not len(targets):
+                continue
+            # Never a dense pass over all n pages per chunk, so a sweep
+            # stays linear in the links however many chunks there are
+            low = int(targets.min())
+            high = int(targets.max()) + 1
+            if high - low <= SPREAD * len(targets):
+                new_ranks[low:high] += np.bincount(targets - low,
+                                                   weights=shares[sources],
+                                                   minlength=high - low)
+            else:
+                np.add.at(new_ranks, targets, shares[sources])
+        new_ranks = ((1 - damping_factor) / n
+                     + damping_factor
+                     * (new_ranks + ranks[dangling].sum() / n))
+        residual = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if history is not None:
+            history.append(residual)
+        if residual < tolerance:
+            break
+
+    return ranks
+
+
+def _chunks(path, offsets, chunk_links):
+    """
+    Yield (sources, targets) arrays for consecutive runs of at most
+    `chunk_links` links of the store at `path`.
+    """
+    with open(os.path.join(path, "targets.npy"), "rb") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            header = np.lib.format.read_array_header_1_0(f)
+        else:
+            header = np.lib.format.read_array_header_2_0(f)
+        shape, _, dtype = header
+        for start in range(0, shape[0], chunk_links):
+            targets = np.fromfile(f, dtype=dtype,
+                                  count=min(chunk_links, shape[0] - start))
+            end = start + len(targets)
+            # Pages whose links overlap [start, end)
+            first = np.searchsorted(offsets, start, side="right") - 1
+            last = np.searchsorted(offsets, end, side="left")
+            counts = np.diff(np.clip(offsets[first:last + 1], start, end))
+            sources = np.repeat(np.arange(first, last), counts)
+            yield sources, targets
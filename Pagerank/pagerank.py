@@ -1,31 +1,118 @@
+import argparse
 import os
 import random
 import re
-import sys
 import numpy as np
 
+from linkgraph import (LinkGraph, clear_store, load_ranks, load_stamp,
+                       power_iteration, sample_ranks, save_ranks, save_stamp)
+
 
 DAMPING = 0.85
 SAMPLES = 10000
 
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    print(transition_model(corpus,"3.html",DAMPING))
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
+    parser = argparse.ArgumentParser(
+        usage="python pagerank.py corpus [--store DIR] [--processes N] "
+              "[--out-of-core]"
+    )
+    parser.add_argument("corpus")
+    parser.add_argument("--store", metavar="DIR",
+                        help="load the link graph and ranks from DIR, "
+                             "crawling and computing them only if missing")
+    parser.add_argument("--processes", type=int, metavar="N",
+                        help="iterate with N worker processes sharing "
+                             "the link graph")
+    parser.add_argument("--out-of-core", action="store_true",
+                        help="iterate over the link graph on disk in "
+                             "--store rather than loading it (no sampling)")
+    args = parser.parse_args()
+    if args.out_of_core and args.store is None:
+        parser.error("--out-of-core requires --store")
+
+    if args.out_of_core:
+        ranks = stream_ranks(args.corpus, args.store)
+        print(f"PageRank Results from Iteration")
+        for page in sorted(ranks):
+            print(f"  {page}: {ranks[page]:.4f}")
+        return
+
+    graph = load_graph(args.corpus, args.store)
+    ranks = graph.to_dict(sample_ranks(graph, DAMPING, SAMPLES))
     #print(ranks)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
        print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
+    ranks = graph.to_dict(iterate_ranks(graph, args.store, args.processes))
     #print(ranks)
     print(f"PageRank Results from Iteration")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
 
 
+def load_graph(directory, store=None):
+    """
+    Return the LinkGraph of the corpus in `directory`, crawling it in
+    parallel. With a `store` directory, a graph saved there from the
+    same corpus is loaded instead; otherwise the store is rebuilt.
+    """
+    from crawler import corpus_stamp, crawl_graph
+    if store is None:
+        return crawl_graph(directory)
+    stamp = corpus_stamp(directory)
+    if load_stamp(store) == stamp:
+        return LinkGraph.load(store)
+    clear_store(store)
+    graph = crawl_graph(directory)
+    graph.save(store)
+    save_stamp(store, stamp)
+    return graph
+
+
+def iterate_ranks(graph, store=None, processes=None):
+    """
+    Return the PageRank vector of `graph` by power iteration, loading
+    it from `store` if it was saved there and saving it otherwise.
+    Given a number of `processes`, each sweep is split between that
+    many worker processes.
+    """
+    ranks = None if store is None else load_ranks(store, "ranks")
+    if ranks is None or len(ranks) != len(graph):
+        if processes:
+            from parallel import parallel_power_iteration
+            ranks = parallel_power_iteration(graph, DAMPING,
+                                             processes=processes)
+        else:
+            ranks = power_iteration(graph, DAMPING)
+        if store is not None:
+            save_ranks(store, "ranks", ranks)
+    return ranks
+
+
+def stream_ranks(directory, store):
+    """
+    Return PageRank values for each page in `directory` by power
+    iteration over the link graph saved in `store`, streamed from disk
+    each sweep. The graph is crawled into `store` first unless it was
+    already built from the same corpus.
+    """
+    from crawler import corpus_stamp
+    from outofcore import build_store, stream_power_iteration
+    stamp = corpus_stamp(directory)
+    if load_stamp(store) != stamp:
+        clear_store(store)
+        build_store(directory, store)
+        save_stamp(store, stamp)
+    ranks = load_ranks(store, "ranks")
+    if ranks is None:
+        ranks = stream_power_iteration(store, DAMPING)
+        save_ranks(store, "ranks", ranks)
+    with open(os.path.join(store, "names.txt"), encoding="utf-8") as f:
+        names = f.read().split("\n")[:-1]
+    return {name: float(rank) for name, rank in zip(names, ranks)}
+
+
 def crawl(directory):
     """
     Parse a directory of HTML pages and check for links to other pages.
@@ -140,6 +227,17 @@ def sample_pagerank(corpus, damping_factor, n):
     return trans_model
 
 
+def vector_sample_pagerank(corpus, damping_factor, n, seed=None):
+    """
+    Return PageRank values for each page like `sample_pagerank`, but
+    with the corpus converted once into link arrays and many random
+    surfers advanced in parallel with NumPy. Passing a `seed` makes
+    the result reproducible.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    return graph.to_dict(sample_ranks(graph, damping_factor, n, seed=seed))
+
+
 def iterate_pagerank(corpus, damping_factor):
     """
     Return PageRank values for each page by iteratively updating
@@ -170,6 +268,20 @@ def iterate_pagerank(corpus, damping_factor):
 
     return page_ranks
 
+def sparse_iterate_pagerank(corpus, damping_factor, tolerance=1e-8):
+    """
+    Return PageRank values for each page like `iterate_pagerank`, but
+    with the corpus converted once into sparse link arrays and updated
+    with vectorized power iteration until the total change in ranks
+    between sweeps is below `tolerance`.
+
+    A page with no links is interpreted as having one link to every
+    page in the corpus (including itself).
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    return graph.to_dict(power_iteration(graph, damping_factor, tolerance))
+
+
 def sum(page_rank):
     sum = 0
     for item in page_rank:
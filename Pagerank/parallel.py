@@ -0,0 +1,148 @@
+import os
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+
+# Shared arrays attached in each worker process, by name
+arrays = {}
+
+# Keeps each worker's shared memory blocks open while it runs
+blocks = []
+
+
+class SharedArrays():
+    """
+    NumPy arrays placed in named shared memory blocks, so that worker
+    processes can attach to them without copying.
+
+    Use as a context manager: the blocks are freed on exit.
+    """
+
+    def __init__(self):
+        self.blocks = []
+        self.arrays = {}
+        self.specs = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.arrays.clear()
+        for block in self.blocks:
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+    def add(self, name, values=None, shape=None, dtype=np.float64):
+        """
+        Create shared array `name`, a copy of `values` if given, or else
+        zeros of `shape` and `dtype`. Returns the array.
+        """
+        if values is not None:
+            values = np.asarray(values)
+            shape, dtype = values.shape, values.dtype
+        dtype = np.dtype(dtype)
+        size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+        block = shared_memory.SharedMemory(create=True, size=size)
+        self.blocks.append(block)
+        array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        if values is not None:
+            array[...] = values
+        else:
+            array.fill(0)
+        self.arrays[name] = array
+        self.specs[name] = (block.name, shape, dtype.str)
+        return array
+
+
+def parallel_power_iteration(graph, damping_factor, tolerance=1e-8,
+                             max_iterations=1000, processes=None,
+                             blocks_per_process=4, history=None):
+    """
+    Return the PageRank vector of `graph` like `power_iteration`, but
+    with each sweep's sparse multiply split across a pool of
+    `processes` worker processes.
+
+    The pages are cut into blocks of consecutive pages with about the
+    same number of incoming links each, `blocks_per_process` per
+    process, and the links grouped by the block they point into. All
+    arrays live in shared memory: each sweep the parent writes every
+    page's rank divided by its number of links, and each worker sums the
+    shares arriving at the pages of one block and writes their new
+    ranks, which no other block touches.
+    The parent then adds the random jump and dangling page terms and
+    checks for convergence, exactly as `power_iteration` does.
+    """
+    n = len(graph)
+    out_degree = np.asarray(graph.out_degree)
+    dangling = out_degree == 0
+    inverse_degree = np.zeros(n)
+    inverse_degree[~dangling] = 1 / out_degree[~dangling]
+
+    # Group the links by destination block, keeping them in source order
+    # within each block; sorting small block numbers is a radix sort
+    targets = np.asarray(graph.targets)
+    in_offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(targets, minlength=n), out=in_offsets[1:])
+    count = min((processes or os.cpu_count() or 1) * blocks_per_process,
+                np.iinfo(np.uint16).max)
+    cuts = _cuts(in_offsets, count)
+    block_of = np.repeat(np.arange(len(cuts) - 1, dtype=np.uint16),
+                         np.diff(cuts))
+    order = np.argsort(block_of[targets], kind="stable")
+    tasks = [(int(lo), int(hi), int(in_offsets[lo]), int(in_offsets[hi]))
+             for lo, hi in zip(cuts[:-1], cuts[1:])]
+    del block_of, in_offsets
+
+    with SharedArrays() as shared:
+        shared.add("in_sources", np.asarray(graph.sources)[order])
+        shared.add("in_targets", targets[order])
+        shares = shared.add("shares", shape=n)
+        new_ranks = shared.add("new_ranks", shape=n)
+        del order
+
+        with Pool(processes, initializer=_init_worker,
+                  initargs=(shared.specs,)) as pool:
+            ranks = np.full(n, 1 / n)
+            for _ in range(max_iterations):
+                np.multiply(ranks, inverse_degree, out=shares)
+                for _ in pool.imap_unordered(_multiply_block, tasks):
+                    pass
+                result = ((1 - damping_factor) / n
+                          + damping_factor
+                          * (new_ranks + ranks[dangling].sum() / n))
+                residual = np.abs(result - ranks).sum()
+                ranks = result
+                if history is not None:
+                    history.append(residual)
+                if residual < tolerance:
+                    break
+
+    return ranks
+
+
+def _cuts(in_offsets, count):
+    """
+    Return the boundaries of at most `count` ranges of consecutive
+    pages with about the same number of incoming links each.
+    """
+    n = len(in_offsets) - 1
+    cuts = np.searchsorted(in_offsets,
+                           np.linspace(0, in_offsets[-1], count + 1))
+    return np.unique(np.clip(np.concatenate([[0], cuts, [n]]), 0, n))
+
+
+def _init_worker(specs):
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+
+def _multiply_block(task):
+    lo, hi, start, end = task
+    sources = arrays["in_sources"][start:end]
+    targets = arrays["in_targets"][start:end]
+    arrays["new_ranks"][lo:hi] = np.bincount(
+        targets - lo, weights=arrays["shares"][sources], minlength=hi - lo
+    )
@@ -0,0 +1,163 @@
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from linkgraph import power_iteration
+
+METHODS = ["power", "push", "montecarlo"]
+
+
+class PersonalizedPageRank():
+    """
+    Answers personalized PageRank queries against one loaded LinkGraph.
+
+    A query names a set of seed pages: random jumps, and pages with no
+    links, lead back to a seed chosen uniformly instead of to any page.
+    Results are kept in an LRU cache keyed by the seed set, damping
+    factor and method, so repeated queries cost a dictionary lookup.
+
+    Besides exact power iteration, two approximations answer top-k
+    queries without touching the whole graph: "push" (forward push of
+    residual probability from the seeds) and "montecarlo" (random walks
+    that restart at the seeds).
+    """
+
+    def __init__(self, graph, cache_size=128, epsilon=1e-6, walks=100000,
+                 seed=None):
+        """
+        `epsilon` is the residual per link left unpushed by "push", and
+        `walks` the number of walks taken by "montecarlo", which are
+        drawn from a generator seeded with `seed`.
+        """
+        self.graph = graph
+        self.cache_size = cache_size
+        self.epsilon = epsilon
+        self.walks = walks
+        self.rng = np.random.default_rng(seed)
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def query(self, seeds, damping_factor=0.85, method="power", k=10):
+        """
+        Return the `k` pages with the highest personalized PageRank for
+        the seed page names `seeds`, as (page, rank) pairs, best first.
+        Pass k=None to get every page with a nonzero rank.
+        """
+        pages, ranks = self.ranks(seeds, damping_factor, method)
+        if k is not None and k < len(ranks):
+            best = np.argpartition(-ranks, k)[:k]
+        else:
+            best = np.arange(len(ranks))
+        best = best[np.argsort(-ranks[best], kind="stable")]
+        return [(self.graph.names[pages[i]], float(ranks[i])) for i in best
+                if ranks[i] > 0]
+
+    def ranks(self, seeds, damping_factor=0.85, method="power"):
+        """
+        Return (pages, ranks) arrays giving the personalized PageRank of
+        the pages listed, from the cache when possible. Pages missing
+        from `pages` have a rank of (approximately) 0.
+        """
+        if method not in METHODS:
+            raise ValueError(f"unknown method {method!r}")
+        seeds = frozenset(seeds)
+        if not seeds:
+            raise ValueError("no seed pages")
+        key = (seeds, damping_factor, method)
+        if key in self.cache:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return self.cache[key]
+
+        self.misses += 1
+        indices = np.array(sorted(self.graph.index[seed] for seed in seeds))
+        if method == "power":
+            result = self._power(indices, damping_factor)
+        elif method == "push":
+            result = self._push(indices, damping_factor)
+        else:
+            result = self._montecarlo(indices, damping_factor)
+
+        self.cache[key] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return result
+
+    def _power(self, seeds, damping_factor):
+        """Exact personalized PageRank by power iteration."""
+        n = len(self.graph)
+        teleport = np.zeros(n)
+        teleport[seeds] = 1 / len(seeds)
+        ranks = power_iteration(self.graph, damping_factor,
+                                ranks=teleport, teleport=teleport)
+        return np.arange(n), ranks
+
+    def _push(self, seeds, damping_factor):
+        """
+        Approximate personalized PageRank by forward push: each page
+        holds residual probability, and a page with more than epsilon
+        residual per link keeps (1 - d) of it as rank and passes the
+        rest along its links, or back to the seeds if it has none.
+        """
+        offsets = self.graph.offsets
+        targets = self.graph.targets
+        out_degree = self.graph.out_degree
+        share = 1 / len(seeds)
+        rank = {}
+        residual = {int(seed): share for seed in seeds}
+        queue = deque(residual)
+
+        while queue:
+            page = queue.popleft()
+            amount = residual.get(page, 0.0)
+            degree = int(out_degree[page])
+            if amount <= self.epsilon * max(degree, 1):
+                continue
+            residual[page] = 0.0
+            rank[page] = rank.get(page, 0.0) + (1 - damping_factor) * amount
+            if degree:
+                links = targets[offsets[page]:offsets[page + 1]].tolist()
+                spread = damping_factor * amount / degree
+            else:
+                links = seeds.tolist()
+                spread = damping_factor * amount * share
+            for link in links:
+                before = residual.get(link, 0.0)
+                residual[link] = before + spread
+                limit = self.epsilon * max(int(out_degree[link]), 1)
+                if before <= limit < before + spread:
+                    queue.append(link)
+
+        pages = np.fromiter(rank, dtype=np.int64, count=len(rank))
+        return pages, np.fromiter(rank.values(), dtype=np.float64,
+                                  count=len(rank))
+
+    def _montecarlo(self, seeds, damping_factor):
+        """
+        Approximate personalized PageRank as where random walks end:
+        each walk starts at a random seed and, before every step, stops
+        with probability 1 - d. A step follows a random link, or jumps
+        back to a random seed from a page with no links.
+        """
+        offsets = self.graph.offsets
+        targets = self.graph.targets
+        out_degree = self.graph.out_degree
+        rng = self.rng
+
+        current = seeds[rng.integers(0, len(seeds), size=self.walks)]
+        ends = []
+        while len(current):
+            stop = rng.random(len(current)) >= damping_factor
+            ends.append(current[stop])
+            current = current[~stop]
+
+            degree = out_degree[current]
+            linked = degree > 0
+            choice = (rng.random(len(current)) * degree).astype(np.int64)
+            following = current[linked]
+            current = seeds[rng.integers(0, len(seeds), size=len(current))]
+            current[linked] = targets[offsets[following] + choice[linked]]
+
+        pages, counts = np.unique(np.concatenate(ends), return_counts=True)
+        return pages, counts / self.walks
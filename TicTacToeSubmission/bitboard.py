@@ -0,0 +1,135 @@
+"""
+Bitboard representation of Tic Tac Toe boards
+
+A board is a pair of 9-bit masks (x, o) giving the cells taken by each
+player, with cell (i, j) at bit 3 * i + j.
+"""
+
+X = "X"
+O = "O"
+EMPTY = None
+
+FULL = 0b111111111
+
+# Masks of the 3 rows, 3 columns and 2 diagonals
+LINES = (0b000000111, 0b000111000, 0b111000000,
+         0b001001001, 0b010010010, 0b100100100,
+         0b100010001, 0b001010100)
+
+# Number of bits set in every 9-bit mask
+POPCOUNT = tuple(bin(mask).count("1") for mask in range(FULL + 1))
+
+
+def _symmetries():
+    """
+    Returns the 8 rotations and reflections of the board, each as a
+    tuple giving for every cell the cell it is taken from.
+    """
+    rotate = (6, 3, 0, 7, 4, 1, 8, 5, 2)
+    reflect = (2, 1, 0, 5, 4, 3, 8, 7, 6)
+    symmetries = []
+    symmetry = tuple(range(9))
+    for _ in range(4):
+        symmetries.append(symmetry)
+        symmetries.append(tuple(symmetry[i] for i in reflect))
+        symmetry = tuple(symmetry[i] for i in rotate)
+    return tuple(symmetries)
+
+
+SYMMETRIES = _symmetries()
+
+# TRANSFORMS[s][mask] is `mask` rearranged by symmetry s
+TRANSFORMS = tuple(
+    tuple(sum(((mask >> cell) & 1) << i for i, cell in enumerate(symmetry))
+          for mask in range(FULL + 1))
+    for symmetry in SYMMETRIES
+)
+
+
+def from_board(board):
+    """
+    Returns the bitboard (x, o) of a list-of-lists board.
+    """
+    x = o = 0
+    for i in range(3):
+        for j in range(3):
+            if board[i][j] == X:
+                x |= 1 << (3 * i + j)
+            elif board[i][j] == O:
+                o |= 1 << (3 * i + j)
+    return x, o
+
+
+def to_board(x, o):
+    """
+    Returns the list-of-lists board of bitboard (x, o).
+    """
+    return [[X if x >> (3 * i + j) & 1 else O if o >> (3 * i + j) & 1
+             else EMPTY for j in range(3)] for i in range(3)]
+
+
+def player(x, o):
+    """
+    Returns player who has the next turn on a board.
+    """
+    return X if POPCOUNT[x] == POPCOUNT[o] else O
+
+
+def moves(x, o):
+    """
+    Returns the indices of the empty cells of a board, in order.
+    """
+    empty = FULL & ~(x | o)
+    return [cell for cell in range(9) if empty >> cell & 1]
+
+
+def wins(mask):
+    """
+    Returns True if the cells of `mask` complete a line.
+    """
+    for line in LINES:
+        if mask & line == line:
+            return True
+    return False
+
+
+def winner(x, o):
+    """
+    Returns the winner of the game, if there is one.
+    """
+    if wins(x):
+        return X
+    if wins(o):
+        return O
+    return None
+
+
+def terminal(x, o):
+    """
+    Returns True if game is over, False otherwise.
+    """
+    return x | o == FULL or wins(x) or wins(o)
+
+
+def utility(x, o):
+    """
+    Returns 1 if X has won the game, -1 if O has won, 0 otherwise.
+    """
+    if wins(x):
+        return 1
+    if wins(o):
+        return -1
+    return 0
+
+
+def canonical(x, o):
+    """
+    Returns the board's canonical key, the smallest of x | o << 9 over
+    its 8 symmetric forms, and the symmetry that gives it.
+    """
+    best = None
+    for transform, symmetry in zip(TRANSFORMS, SYMMETRIES):
+        key = transform[x] | transform[o] << 9
+        if best is None or key < best:
+            best, best_symmetry = key, symmetry
+    return best, best_symmetry
@@ -0,0 +1,44 @@
+"""
+Builds the perfect-play table used by tictactoe.minimax
+
+Run `python book.py` once to write book.json next to tictactoe.py.
+"""
+
+import json
+
+import bitboard
+import tictactoe
+
+
+def build():
+    """
+    Returns a dictionary mapping the bitboard key x | o << 9 of every
+    position reachable from the empty board, where the game is not
+    over, to the best move there as a cell index.
+    """
+    moves = {}
+    frontier = [(0, 0)]
+    while frontier:
+        x, o = frontier.pop()
+        key = x | o << 9
+        if key in moves or bitboard.terminal(x, o):
+            continue
+        value, move = tictactoe.solve(x, o)
+        moves[key] = move
+        for cell in bitboard.moves(x, o):
+            if bitboard.player(x, o) == bitboard.X:
+                frontier.append((x | 1 << cell, o))
+            else:
+                frontier.append((x, o | 1 << cell))
+    return moves
+
+
+def main():
+    moves = build()
+    with open(tictactoe.BOOK, "w") as f:
+        json.dump({str(key): move for key, move in sorted(moves.items())}, f)
+    print(f"Wrote {len(moves)} positions to {tictactoe.BOOK}")
+
+
+if __name__ == "__main__":
+    main()
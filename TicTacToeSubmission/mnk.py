@@ -0,0 +1,406 @@
+"""
+Generalized Tic Tac Toe: the m,n,k-game
+
+Two players take turns placing marks on an m by n board, and the first
+to get k marks in a row (across, down or diagonally) wins. 3,3,3 is Tic
+Tac Toe. Boards too large to search to the end are searched to a depth
+limit, deepening until a time budget runs out, and positions at the
+limit are scored by a heuristic.
+"""
+
+import argparse
+import time
+
+X = "X"
+O = "O"
+EMPTY = None
+
+# Score of a win, plus the number of empty cells left when it happens,
+# so that quicker wins (and slower losses) score better
+WIN = 1000000
+
+# Kinds of value stored in the transposition table
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Directions in which lines run, as (row step, column step)
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+# The engine searching in each worker process of a root split
+engine = None
+
+
+class Timeout(Exception):
+    pass
+
+
+class Engine():
+    """
+    Searches m,n,k-game positions held as bitboards: a pair of masks
+    (x, o) giving the cells taken by each player, with cell (i, j) at
+    bit n * i + j.
+    """
+
+    def __init__(self, m=3, n=3, k=3):
+        if not 1 <= k <= max(m, n):
+            raise ValueError(f"no {k} in a row on a {m} by {n} board")
+        self.m = m
+        self.n = n
+        self.k = k
+        self.size = m * n
+        self.full = (1 << self.size) - 1
+
+        # For each cell and direction, the bits of the cells beyond it
+        # in that direction and in the opposite one, nearest first
+        self.rays = []
+        for cell in range(self.size):
+            i, j = divmod(cell, n)
+            self.rays.append([
+                (self._ray(i, j, di, dj), self._ray(i, j, -di, -dj))
+                for di, dj in DIRECTIONS
+            ])
+
+        # Masks of every k cells in a row, and how many hold each cell
+        self.windows = []
+        for i in range(m):
+            for j in range(n):
+                for di, dj in DIRECTIONS:
+                    cells = [(i + di * step, j + dj * step)
+                             for step in range(k)]
+                    if all(0 <= a < m and 0 <= b < n for a, b in cells):
+                        self.windows.append(
+                            sum(1 << (a * n + b) for a, b in cells)
+                        )
+        weight = [sum(window >> cell & 1 for window in self.windows)
+                  for cell in range(self.size)]
+        # Cells on more lines first, to cut off more of the search
+        self.order = sorted(range(self.size), key=lambda cell: -weight[cell])
+
+        # Heuristic value of a line holding some marks of only one player
+        self.weights = [0] + [10 ** count for count in range(1, k)]
+
+        self.table = {}
+        self.deadline = None
+
+        # Nodes searched, and transposition table lookups and hits
+        self.nodes = 0
+        self.probes = 0
+        self.hits = 0
+
+    def _ray(self, i, j, di, dj):
+        bits = []
+        i, j = i + di, j + dj
+        while 0 <= i < self.m and 0 <= j < self.n and len(bits) < self.k:
+            bits.append(1 << (i * self.n + j))
+            i, j = i + di, j + dj
+        return bits
+
+    def initial_state(self):
+        """
+        Returns starting state of the board.
+        """
+        return [[EMPTY] * self.n for _ in range(self.m)]
+
+    def from_board(self, board):
+        """
+        Returns the bitboard (x, o) of a list-of-lists board.
+        """
+        x = o = 0
+        for i in range(self.m):
+            for j in range(self.n):
+                if board[i][j] == X:
+                    x |= 1 << (i * self.n + j)
+                elif board[i][j] == O:
+                    o |= 1 << (i * self.n + j)
+        return x, o
+
+    def to_board(self, x, o):
+        """
+        Returns the list-of-lists board of bitboard (x, o).
+        """
+        board = self.initial_state()
+        for cell in range(self.size):
+            i, j = divmod(cell, self.n)
+            if x >> cell & 1:
+                board[i][j] = X
+            elif o >> cell & 1:
+                board[i][j] = O
+        return board
+
+    def player(self, x, o):
+        """
+        Returns player who has the next turn on a board.
+        """
+        return X if bin(x).count("1") == bin(o).count("1") else O
+
+    def wins(self, mask, cell):
+        """
+        Returns True if the mark at `cell` completes k in a row of the
+        marks in `mask`. Only lines through `cell` are checked, so this
+        is all the checking a move needs.
+        """
+        for forward, backward in self.rays[cell]:
+            count = 1
+            for bit in forward:
+                if not mask & bit:
+                    break
+                count += 1
+            for bit in backward:
+                if not mask & bit:
+                    break
+                count += 1
+            if count >= self.k:
+                return True
+        return False
+
+    def winner(self, x, o):
+        """
+        Returns the winner of the game, if there is one.
+        """
+        for window in self.windows:
+            if x & window == window:
+                return X
+            if o & window == window:
+                return O
+        return None
+
+    def evaluate(self, x, o):
+        """
+        Returns a heuristic value of a board for X: every line of k
+        cells still open to just one player counts for that player, more
+        the more of its marks are already there.
+        """
+        score = 0
+        for window in self.windows:
+            mine = x & window
+            theirs = o & window
+            if mine and not theirs:
+                score += self.weights[bin(mine).count("1")]
+            elif theirs and not mine:
+                score -= self.weights[bin(theirs).count("1")]
+        return score
+
+    def search(self, x, o, time_limit=1.0, max_depth=None):
+        """
+        Returns (move, value, depth): the best move for the player to
+        move on bitboard (x, o) as a cell index, its value for that
+        player, and the depth searched to.
+
+        Searches to depth 1, 2, 3, ... until the game is searched to the
+        end, `max_depth` is reached or `time_limit` seconds run out; an
+        unfinished search is discarded. Each search starts with the best
+        moves the previous ones left in the transposition table.
+        """
+        empty = self.size - bin(x | o).count("1")
+        if empty == 0:
+            return None, 0, 0
+        if max_depth is None or max_depth > empty:
+            max_depth = empty
+        self.deadline = (None if time_limit is None
+                         else time.perf_counter() + time_limit)
+        move = next(cell for cell in self.order
+                    if not (x | o) >> cell & 1)
+        value = None
+        depth = 0
+        try:
+            for limit in range(1, max_depth + 1):
+                value, found = self.negamax(x, o, limit, -2 * WIN, 2 * WIN)
+                move, depth = found, limit
+                if abs(value) > WIN:
+                    break
+        except Timeout:
+            pass
+        finally:
+            self.deadline = None
+        return move, value, depth
+
+    def negamax(self, x, o, depth, alpha, beta):
+        """
+        Returns (value, move) for the player to move on bitboard (x, o),
+        searching `depth` moves ahead with alpha-beta pruning.
+        """
+        self.nodes += 1
+        if (self.deadline is not None and self.nodes & 1023 == 0
+                and time.perf_counter() > self.deadline):
+            raise Timeout
+
+        turn_x = bin(x).count("1") == bin(o).count("1")
+        taken = x | o
+        if taken == self.full:
+            return 0, None
+        if depth == 0:
+            value = self.evaluate(x, o)
+            return (value if turn_x else -value), None
+
+        key = x | o << self.size
+        entry = self.table.get(key)
+        self.probes += 1
+        first = None
+        if entry is not None:
+            entry_depth, value, kind, first = entry
+            if entry_depth >= depth and (
+                    kind == EXACT or (kind == LOWER and value >= beta)
+                    or (kind == UPPER and value <= alpha)):
+                self.hits += 1
+                return value, first
+
+        moves = [cell for cell in self.order if not taken >> cell & 1]
+        if first is not None:
+            moves.remove(first)
+            moves.insert(0, first)
+
+        lower = alpha
+        best_value = -2 * WIN
+        best_move = None
+        empty = len(moves) - 1
+        for move in moves:
+            bit = 1 << move
+            if turn_x:
+                if self.wins(x | bit, move):
+                    value = WIN + empty
+                else:
+                    value = -self.negamax(x | bit, o, depth - 1,
+                                          -beta, -alpha)[0]
+            else:
+                if self.wins(o | bit, move):
+                    value = WIN + empty
+                else:
+                    value = -self.negamax(x, o | bit, depth - 1,
+                                          -beta, -alpha)[0]
+            if value > best_value:
+                best_value, best_move = value, move
+                alpha = max(alpha, value)
+                if alpha >= beta:
+                    break
+
+        if best_value <= lower:
+            kind = UPPER
+        elif best_value >= beta:
+            kind = LOWER
+        else:
+            kind = EXACT
+        self.table[key] = (depth, best_value, kind, best_move)
+        return best_value, best_move
+
+    def split_search(self, x, o, pool, time_limit=1.0, max_depth=None):
+        """
+        Returns (move, value, depth) like `search`, but searches the
+        position after each possible move in parallel in `pool`, a
+        process pool started with `init_worker(m, n, k)`.
+
+        Each depth is searched for every move in a separate worker with
+        a full window, as the workers cannot share alpha-beta bounds.
+        The work done in the workers is added to this engine's counts.
+        """
+        taken = x | o
+        moves = [cell for cell in self.order if not taken >> cell & 1]
+        if not moves:
+            return None, 0, 0
+        if max_depth is None or max_depth > len(moves):
+            max_depth = len(moves)
+        turn_x = bin(x).count("1") == bin(o).count("1")
+        # Wall clock time, as the workers cannot share performance counters
+        deadline = None if time_limit is None else time.time() + time_limit
+
+        children = []
+        for cell in moves:
+            bit = 1 << cell
+            child = (x | bit, o) if turn_x else (x, o | bit)
+            if self.wins(child[0] if turn_x else child[1], cell):
+                return cell, WIN + len(moves) - 1, 1
+            children.append((cell, child))
+
+        move, value, depth = moves[0], None, 0
+        for limit in range(1, max_depth + 1):
+            tasks = [(child, limit - 1, deadline)
+                     for cell, child in children]
+            results = pool.map(_child_value, tasks)
+            timed_out = False
+            best = None
+            for (cell, child), (child_value, nodes, probes, hits) in zip(
+                    children, results):
+                self.nodes += nodes
+                self.probes += probes
+                self.hits += hits
+                if child_value is None:
+                    timed_out = True
+                elif best is None or -child_value > best[1]:
+                    best = (cell, -child_value)
+            if timed_out:
+                break
+            (move, value), depth = best, limit
+            if abs(value) > WIN:
+                break
+        return move, value, depth
+
+    def best_move(self, board, time_limit=1.0, max_depth=None):
+        """
+        Returns the move (i, j) to play on a list-of-lists board, or
+        None if the board is full or the game is over.
+        """
+        x, o = self.from_board(board)
+        if self.winner(x, o) is not None:
+            return None
+        move, value, depth = self.search(x, o, time_limit, max_depth)
+        return None if move is None else divmod(move, self.n)
+
+
+def init_worker(m, n, k):
+    global engine
+    engine = Engine(m, n, k)
+
+
+def _child_value(task):
+    """
+    Returns the value of a position for the player to move, searched
+    `depth` moves ahead, or None if the `deadline` (by time.time) passed,
+    with the number of nodes, table lookups and table hits it took.
+    """
+    (x, o), depth, deadline = task
+    before = (engine.nodes, engine.probes, engine.hits)
+    if deadline is not None:
+        engine.deadline = time.perf_counter() + deadline - time.time()
+    try:
+        value = engine.negamax(x, o, depth, -2 * WIN, 2 * WIN)[0]
+    except Timeout:
+        value = None
+    finally:
+        engine.deadline = None
+    return (value, engine.nodes - before[0], engine.probes - before[1],
+            engine.hits - before[2])
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play an m,n,k-game between two copies of the AI."
+    )
+    parser.add_argument("-m", type=int, default=4, help="rows")
+    parser.add_argument("-n", type=int, default=4, help="columns")
+    parser.add_argument("-k", type=int, default=4,
+                        help="marks in a row needed to win")
+    parser.add_argument("--time", type=float, default=1.0,
+                        help="seconds per move")
+    args = parser.parse_args()
+
+    engine = Engine(args.m, args.n, args.k)
+    x = o = 0
+    while engine.winner(x, o) is None and x | o != engine.full:
+        player = engine.player(x, o)
+        start = time.perf_counter()
+        move, value, depth = engine.search(x, o, args.time)
+        seconds = time.perf_counter() - start
+        if player == X:
+            x |= 1 << move
+        else:
+            o |= 1 << move
+        print(f"{player} plays {divmod(move, engine.n)} "
+              f"(depth {depth}, value {value}, {seconds:.2f}s)")
+
+    for row in engine.to_board(x, o):
+        print(" ".join(cell or "." for cell in row))
+    print(f"Winner: {engine.winner(x, o) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Headless self-play benchmark for the Tic Tac Toe AI
+
+Plays the AI against itself many times, without pygame, and prints how
+much searching it did as JSON.
+"""
+
+import argparse
+import json
+import multiprocessing
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import mnk
+import tictactoe
+
+# AIs to benchmark, and whether each plays only 3 by 3 Tic Tac Toe
+ENGINES = {
+    "minimax": True,
+    "solve": True,
+    "split": True,
+    "mnk": False,
+    "mnk-split": False
+}
+
+
+def play(engine, games, m=3, n=3, k=3, random_moves=1, time_limit=1.0,
+         processes=None, seed=0):
+    """
+    Plays `games` games of the m,n,k-game with `engine` moving for both
+    players, after `random_moves` random moves at the start of each
+    game, and returns the results and measurements as a dictionary.
+    Meant to run in a fresh process, so that no transposition table
+    starts out filled by another engine.
+    """
+    if ENGINES[engine] and (m, n, k) != (3, 3, 3):
+        raise ValueError(f"{engine} only plays 3 by 3 Tic Tac Toe")
+    rng = random.Random(seed)
+    referee = mnk.Engine(m, n, k)
+    searcher = mnk.Engine(m, n, k)
+    pool = None
+    if engine == "split":
+        pool = multiprocessing.Pool(processes)
+    elif engine == "mnk-split":
+        pool = multiprocessing.Pool(processes, initializer=mnk.init_worker,
+                                    initargs=(m, n, k))
+
+    def counts():
+        if ENGINES[engine]:
+            return dict(tictactoe.stats)
+        return {"nodes": searcher.nodes, "probes": searcher.probes,
+                "hits": searcher.hits}
+
+    def choose(x, o):
+        if engine == "minimax":
+            move = tictactoe.minimax(referee.to_board(x, o))
+        elif engine == "split":
+            move = tictactoe.split_minimax(referee.to_board(x, o), pool)
+        elif engine == "solve":
+            return tictactoe.solve(x, o)[1]
+        elif engine == "mnk":
+            return searcher.search(x, o, time_limit)[0]
+        else:
+            return searcher.split_search(x, o, pool, time_limit)[0]
+        return move[0] * 3 + move[1]
+
+    before = counts()
+    results = {"X": 0, "O": 0, "draw": 0}
+    move_seconds = []
+    try:
+        for _ in range(games):
+            x = o = 0
+            winner = None
+            for ply in range(referee.size):
+                if ply < random_moves:
+                    empty = [cell for cell in range(referee.size)
+                             if not (x | o) >> cell & 1]
+                    cell = rng.choice(empty)
+                else:
+                    start = time.perf_counter()
+                    cell = choose(x, o)
+                    move_seconds.append(time.perf_counter() - start)
+                if ply % 2 == 0:
+                    x |= 1 << cell
+                    if referee.wins(x, cell):
+                        winner = "X"
+                        break
+                else:
+                    o |= 1 << cell
+                    if referee.wins(o, cell):
+                        winner = "O"
+                        break
+            results[winner or "draw"] += 1
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    after = counts()
+    work = {name: after[name] - before[name] for name in after}
+    seconds = sum(move_seconds)
+    return {
+        "engine": engine,
+        "games": games,
+        "results": results,
+        "moves": len(move_seconds),
+        "nodes": work["nodes"],
+        "nodes_per_second": work["nodes"] / seconds if seconds else None,
+        "move_seconds": percentiles(move_seconds),
+        "mean_move_seconds": (statistics.fmean(move_seconds)
+                              if move_seconds else None),
+        "table_probes": work["probes"],
+        "table_hits": work["hits"],
+        "table_hit_rate": (work["hits"] / work["probes"]
+                           if work["probes"] else None)
+    }
+
+
+def benchmark(engines, games, m=3, n=3, k=3, random_moves=1,
+              time_limit=1.0, processes=None, seed=0):
+    """
+    Runs `play` for every engine, each in its own process, and returns
+    their results.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for engine in engines:
+        # Not a Pool: its workers cannot start pools of their own
+        with ProcessPoolExecutor(1, mp_context=context) as executor:
+            results.append(executor.submit(
+                play, engine, games, m, n, k, random_moves, time_limit,
+                processes, seed
+            ).result())
+    return results
+
+
+def percentiles(values):
+    """
+    Returns the p50, p90, p99 and max of `values`.
+    """
+    if not values:
+        return {}
+    ordered = sorted(values)
+
+    def at(fraction):
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+    return {"p50": at(0.5), "p90": at(0.9), "p99": at(0.99),
+            "max": ordered[-1]}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play the Tic Tac Toe AI against itself and print "
+                    "search measurements as JSON."
+    )
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES),
+                        default=["minimax", "solve", "split"])
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("-m", type=int, default=3, help="rows")
+    parser.add_argument("-n", type=int, default=3, help="columns")
+    parser.add_argument("-k", type=int, default=3,
+                        help="marks in a row needed to win")
+    parser.add_argument("--random-moves", type=int, default=1,
+                        help="random moves opening each game")
+    parser.add_argument("--time", type=float, default=1.0,
+                        help="seconds per move for the mnk engines")
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = benchmark(args.engines, args.games, args.m, args.n, args.k,
+                        random_moves=args.random_moves, time_limit=args.time,
+                        processes=args.processes, seed=args.seed)
+    print(json.dumps({
+        "m": args.m,
+        "n": args.n,
+        "k": args.k,
+        "results": results
+    }, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,34 @@
 Tic Tac Toe Player
 """
 
+import json
 import math
 import copy
+import os
+
+import bitboard
 
 X = "X"
 O = "O"
 EMPTY = None
 
+# Kinds of value stored in the transposition table
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Maps canonical bitboard keys to (value, kind of value, best move) as
+# found by `solve`; the best move is a cell index of the canonical board
+table = {}
+
+# Calls to `solve`, and transposition table lookups and hits
+stats = {"nodes": 0, "probes": 0, "hits": 0}
+
+# Perfect-play table written by book.py, mapping the bitboard key
+# x | o << 9 of every reachable position to its best move
+BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.json")
+book = None
+
 
 def initial_state():
     """
@@ -162,16 +183,130 @@ def minimax(board):
     """
     Returns the optimal action for the current player on the board.
     """
-    if terminal(board):
-        return None
     if (board == initial_state()): #randomize first starting pos if AI is "X"
         return (0,0)
-    number, move = helper(board, player(board))
-    return move
+    x, o = bitboard.from_board(board)
+    move = load_book().get(x | o << 9)
+    if move is None:
+        if terminal(board):
+            return None
+        value, move = solve(x, o)
+    return divmod(move, 3)
 
     raise NotImplementedError
 
 
+def split_minimax(board, pool):
+    """
+    Returns the optimal action like `minimax`, but searches instead of
+    using the book, solving the board after each possible move in
+    parallel in `pool`, a process pool. The work done in the pool is
+    added to `stats`.
+    """
+    if terminal(board):
+        return None
+    if (board == initial_state()):
+        return (0,0)
+    x, o = bitboard.from_board(board)
+    maximizing = bitboard.player(x, o) == X
+    children = [(x | 1 << cell, o) if maximizing else (x, o | 1 << cell)
+                for cell in bitboard.moves(x, o)]
+    best_value = best_move = None
+    for cell, (value, work) in zip(bitboard.moves(x, o),
+                                   pool.starmap(_solve_child, children)):
+        for name in stats:
+            stats[name] += work[name]
+        if (best_value is None or (maximizing and value > best_value)
+                or (not maximizing and value < best_value)):
+            best_value, best_move = value, cell
+    return divmod(best_move, 3)
+
+
+def _solve_child(x, o):
+    before = dict(stats)
+    value, move = solve(x, o)
+    return value, {name: stats[name] - before[name] for name in stats}
+
+
+def load_book():
+    """
+    Returns the perfect-play table, loading it from BOOK the first time.
+    Without a book file it is empty, and `minimax` searches instead.
+    """
+    global book
+    if book is None:
+        try:
+            with open(BOOK) as f:
+                book = {int(key): move for key, move in json.load(f).items()}
+        except FileNotFoundError:
+            book = {}
+    return book
+
+
+def solve(x, o, alpha=-2, beta=2):
+    """
+    Returns the value (as in `utility`) of the bitboard (x, o) and the
+    best move as a cell index, or None if the game is over.
+
+    Searches with alpha-beta pruning, so a value outside the window
+    (alpha, beta) is only a bound on the true value. Results are kept in
+    `table` under the board's canonical key, shared by its 8 symmetric
+    forms, so each position and its mirror images are solved once.
+    """
+    stats["nodes"] += 1
+    key, symmetry = bitboard.canonical(x, o)
+    entry = table.get(key)
+    stats["probes"] += 1
+    if entry is not None:
+        value, kind, move = entry
+        if (kind == EXACT or (kind == LOWER and value >= beta)
+                or (kind == UPPER and value <= alpha)):
+            stats["hits"] += 1
+            return value, None if move is None else symmetry[move]
+
+    maximizing = bitboard.POPCOUNT[x] == bitboard.POPCOUNT[o]
+    # Only the player who just moved can have won
+    if bitboard.wins(o if maximizing else x):
+        value = -1 if maximizing else 1
+        table[key] = (value, EXACT, None)
+        return value, None
+    moves = bitboard.moves(x, o)
+    if not moves:
+        table[key] = (0, EXACT, None)
+        return 0, None
+
+    # Try the best move found by any earlier search first
+    if entry is not None and entry[2] is not None:
+        moves.remove(symmetry[entry[2]])
+        moves.insert(0, symmetry[entry[2]])
+
+    lower, upper = alpha, beta
+    best_value = -2 if maximizing else 2
+    best_move = None
+    for move in moves:
+        if maximizing:
+            value, _ = solve(x | 1 << move, o, alpha, beta)
+            if value > best_value:
+                best_value, best_move = value, move
+                alpha = max(alpha, value)
+        else:
+            value, _ = solve(x, o | 1 << move, alpha, beta)
+            if value < best_value:
+                best_value, best_move = value, move
+                beta = min(beta, value)
+        if alpha >= beta:
+            break
+
+    if best_value <= lower:
+        kind = UPPER
+    elif best_value >= upper:
+        kind = LOWER
+    else:
+        kind = EXACT
+    table[key] = (best_value, kind, symmetry.index(best_move))
+    return best_value, best_move
+
+
 
 def helper(board,players): #assume the AI is the "X" and try to maximize
 